@@ -20,13 +20,20 @@ r"""
 
 import base64
 import contextlib
+import contextvars
 import hashlib
-import inspect
-import io
+import json
 import os
 import re
-import traceback
+import threading
+import time
 import typing as t
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from contextlib import contextmanager
 from enum import Enum
 from html import escape as html_escape
@@ -38,24 +45,21 @@ from pprint import pformat
 from docutils import nodes
 from docutils.parsers import rst
 from docutils.parsers.rst import directives
-from rich import terminal_theme as rich_theme
-from rich.console import Console
-from rich.theme import Theme
 from sphinx import application
 from sphinx.addnodes import pending_xref
+from sphinx.errors import ExtensionError
 from sphinx.util import logging
 from sphinx.util.nodes import make_refnode
 
-# As of typer 0.26 click is vendored into typer (typer._click). Typer commands
-# are instances of the vendored click classes, not the standalone click package
-# (which typer no longer depends on), so we use the vendored click throughout.
-from typer import _click as click
-from typer import rich_utils as typer_rich_utils
-from typer.core import MarkupMode, TyperCommand, TyperGroup
-from typer.main import Typer
-from typer.main import get_command as get_typer_command
-from typer.models import Context as TyperContext
-from typer.models import TyperInfo
+try:
+    from sphinx.util.display import status_iterator
+except ImportError:  # Sphinx < 6.1
+    from sphinx.util import status_iterator
+
+if t.TYPE_CHECKING:
+    from rich import terminal_theme as rich_theme
+
+    from sphinxcontrib.typer.render import TyperDirective
 
 VERSION = (0, 9, 1)
 
@@ -65,10 +69,100 @@ __author__ = "Brian Kohan"
 __license__ = "MIT"
 __copyright__ = "Copyright 2023-2026 Brian Kohan"
 
+logger = logging.getLogger("sphinxcontrib.typer")
+
+# these live in the render module, which imports typer and rich, and are only
+# imported when first accessed
+_RENDER_EXPORTS = {
+    "Command",
+    "IsolatedRender",
+    "RenderCallback",
+    "RenderOptions",
+    "RenderWorker",
+    "RenderedCommand",
+    "TyperDirective",
+    "get_typer_command",
+    "render_commands",
+    "render_isolated",
+    "typer_rich_format_help",
+}
+
+
+def __getattr__(name: str) -> t.Any:
+    if name in _RENDER_EXPORTS:
+        from sphinxcontrib.typer import render
+
+        return getattr(render, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 SELENIUM_DEFAULT_WINDOW_WIDTH = 1920
 SELENIUM_DEFAULT_WINDOW_HEIGHT = 2048
 
+TYPER_CACHE_DEFAULT_MAX_SIZE = 128 * 1024 * 1024
+
+THEME_DEFAULT_DARK_SELECTOR = '[data-theme="dark"]'
+THEME_DEFAULT_LIGHT_SELECTOR = '[data-theme="light"]'
+
+IFRAME_DEFAULT_HEIGHT = 600
+
+# metrics of the rich export_html template as rendered by a browser with default
+# styles: the <pre> block is 16px monospace with a normal line height and a 1em
+# margin (which collapses with the body margin) above and below it
+RICH_HTML_LINE_HEIGHT = 19
+RICH_HTML_CHROME_HEIGHT = 32
+_HTML_CODE_BLOCK = re.compile(r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>", re.DOTALL)
+_IFRAME_HEIGHT_PLACEHOLDER = re.compile(r"typer-iframe-height:([0-9a-f]{64})")
+
+# the directive attributes deferred conversion hooks are passed, see
+# DeferredDirective
+DEFERRED_ATTRS = (
+    "arguments",
+    "options",
+    "builder",
+    "target",
+    "theme",
+    "width",
+    "prog_name",
+    "iframe_height",
+)
+
+# the command path of the artifact being converted, so web drivers acquired by
+# conversion hooks can be attributed to it
+_artifact_command: "contextvars.ContextVar[str]" = contextvars.ContextVar(
+    "typer_artifact_command", default=""
+)
+
+# measures the heights of a batch of html pages by loading each one into a sibling
+# iframe of a single page and returns all of the heights in one round trip
+_MEASURE_IFRAMES_SCRIPT = """
+const pages = arguments[0];
+const done = arguments[arguments.length - 1];
+document.body.innerHTML = "";
+document.body.style.margin = "0";
+if (!pages.length) {
+    done([]);
+    return;
+}
+let loaded = 0;
+const frames = pages.map((page) => {
+    const frame = document.createElement("iframe");
+    frame.style.cssText = `display:block;border:none;height:0;width:${window.innerWidth}px`;
+    frame.onload = () => {
+        if (++loaded === pages.length) {
+            done(
+                frames.map(
+                    (frm) => frm.contentDocument.documentElement.getBoundingClientRect().height
+                )
+            );
+        }
+    };
+    frame.srcdoc = page;
+    document.body.appendChild(frame);
+    return frame;
+});
+"""
+
 
 def get_function(function: t.Union[str, t.Callable[..., t.Any]]):
     if callable(function):
@@ -78,23 +172,226 @@ def get_function(function: t.Union[str, t.Callable[..., t.Any]]):
         return getattr(import_module(".".join(parts[0:-1])), parts[-1])
 
 
-def _filter_commands(ctx: click.Context, cmd_filter: t.List[str]):
-    return [ctx.command.get_command(ctx, cmd_name) for cmd_name in cmd_filter]
+class TyperEvent(t.NamedTuple):
+    """
+    The payload of the ``typer-*`` Sphinx events. Fields that do not apply to an
+    event are None.
+    """
+
+    command: str  # the command path, space separated
+    target: t.Optional[str]
+    docname: t.Optional[str]
+    size: t.Optional[int] = None  # bytes produced
+    duration: t.Optional[float] = None  # seconds
+    cache_hit: t.Optional[bool] = None
+    path: t.Optional[str] = None  # the file written
 
 
-def _add_dependency(env, command):
-    cb = getattr(command, "callback", None)
-    cb = getattr(cb, "__wrapped__", cb)
-    if cb:
-        env.note_dependency(inspect.getfile(cb))
+def _current_docname(env) -> t.Optional[str]:
+    try:
+        return env.docname or None
+    except Exception:
+        return None
 
 
-def _command_path(ctx: t.Optional[click.Context]):
-    parts = []
-    while ctx:
-        parts.append(ctx.info_name)
-        ctx = ctx.parent
-    return ":".join(reversed(parts))
+def emit_event(env, event: str, command: str, target: t.Any = None, **payload):
+    """
+    Emit a ``typer-*`` Sphinx event. Events emitted in the render worker process
+    are forwarded to the Sphinx process as they happen.
+
+    :param env: The Sphinx build environment
+    :param event: The name of the event
+    :param command: The command path the event is about
+    :param target: The render target
+    :param payload: Any other :class:`TyperEvent` fields
+    """
+    emit = getattr(getattr(env, "app", None), "emit", None)
+    if emit:
+        emit(
+            event,
+            TyperEvent(
+                command,
+                str(target) if target else None,
+                _current_docname(env),
+                **payload,
+            ),
+        )
+
+
+@contextmanager
+def profile(env, command: str, phase: str, target: t.Any = None):
+    """
+    Time a phase of the processing of a command if :confval:`typer_profile` is
+    enabled. Timings are recorded per document so they can be merged across
+    parallel read workers.
+
+    :param env: The Sphinx build environment
+    :param command: The command path the time is spent on
+    :param phase: The name of the phase (e.g. render, svg2pdf)
+    :param target: The render target of the command, if known
+    """
+    if not env.app.config.typer_profile:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timings(
+            env, command, {phase: time.perf_counter() - start}, target=target
+        )
+
+
+def record_timings(
+    env,
+    command: str,
+    timings: t.Dict[str, float],
+    target: t.Any = None,
+    docname: t.Optional[str] = None,
+) -> None:
+    """
+    Add phase timings for a command to the profile of the current build.
+
+    :param env: The Sphinx build environment
+    :param command: The command path the time was spent on
+    :param timings: Seconds spent, keyed by phase
+    :param target: The render target of the command, if known
+    :param docname: The document to record the timings under, by default the
+        document being read
+    """
+    if not env.app.config.typer_profile or not timings:
+        return
+    if not hasattr(env, "typer_profile"):
+        env.typer_profile = {}
+    docname = getattr(env, "docname", "") if docname is None else docname
+    record = env.typer_profile.setdefault(docname, {}).setdefault(
+        command, {"target": None, "phases": {}}
+    )
+    if target:
+        record["target"] = str(target)
+    for phase, seconds in timings.items():
+        record["phases"][phase] = record["phases"].get(phase, 0.0) + seconds
+
+
+def _get_attribute(obj: t.Any, attr: str, _: str) -> t.Any:
+    return getattr(obj, attr)
+
+
+class ImportCache:
+    """
+    A build scoped memo of import path resolutions. Directives frequently share
+    import paths, and resolving a path walks up it trying imports until one
+    succeeds, so the modules (and their source files), fully resolved objects and
+    any failures are remembered.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # module path -> (module, source file) or ModuleNotFoundError message
+        self.modules: t.Dict[str, t.Union[t.Tuple[t.Any, t.Optional[str]], str]] = {}
+        # object path -> (object, source file)
+        self.objects: t.Dict[str, t.Tuple[t.Any, t.Optional[str]]] = {}
+        # object path -> error message
+        self.failed: t.Dict[str, str] = {}
+
+    def import_module(self, path: str) -> t.Tuple[t.Any, t.Optional[str]]:
+        """
+        Import a module, returning it and its source file.
+
+        :param path: The python path to the module
+        :raises ModuleNotFoundError: if the module does not exist
+        """
+        if path not in self.modules:
+            try:
+                module = import_module(path)
+                self.modules[path] = (
+                    module,
+                    getattr(find_spec(path), "origin", None),
+                )
+            except ModuleNotFoundError as err:
+                # only modules that do not exist are remembered, errors raised
+                # by the module itself are reported with their full traceback
+                self.modules[path] = str(err)
+                raise
+        entry = self.modules[path]
+        if isinstance(entry, str):
+            raise ModuleNotFoundError(entry, name=path)
+        return entry
+
+
+class DiskCache:
+    """
+    A size bounded, content addressed cache of strings stored on disk. Each entry
+    is stored in its own file named by the hash of its key. When the cache grows
+    beyond its maximum size the least recently used entries are evicted.
+
+    :param directory: The directory to store the cache entries in
+    :param max_size: The maximum size of the cache in bytes, or None for no bound
+    """
+
+    def __init__(self, directory: t.Union[str, Path], max_size: t.Optional[int] = None):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    @staticmethod
+    def key(*parts: t.Any) -> str:
+        """
+        Compute a cache key from the given json serializable parts.
+        """
+        return hashlib.sha256(
+            json.dumps(parts, sort_keys=True, default=repr).encode("utf-8")
+        ).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> t.Optional[str]:
+        """
+        Fetch the value stored under the given key, or None if there is none.
+        """
+        path = self.path(key)
+        try:
+            value = path.read_text(encoding="utf-8")
+            os.utime(path)  # mark the entry as recently used
+        except OSError:
+            return None
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store the value under the given key. Writes are atomic so the cache may be
+        shared by concurrent builds.
+        """
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(value, encoding="utf-8")
+        os.replace(tmp, path)
+
+    def prune(self) -> int:
+        """
+        Evict the least recently used entries until the cache fits within its
+        maximum size.
+
+        :return: The number of evicted entries
+        """
+        if self.max_size is None or not self.directory.is_dir():
+            return 0
+        entries = []
+        for path in self.directory.glob("*/*"):
+            with contextlib.suppress(OSError):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+        size = sum(entry[1] for entry in entries)
+        evicted = 0
+        for _, entry_size, path in sorted(entries, key=lambda entry: entry[0]):
+            if size <= self.max_size:
+                break
+            with contextlib.suppress(OSError):
+                path.unlink()
+                size -= entry_size
+                evicted += 1
+        return evicted
 
 
 class RenderTarget(str, Enum):
@@ -119,7 +416,9 @@ class RenderTheme(str, Enum):
         return self.value
 
     @property
-    def terminal_theme(self) -> rich_theme.TerminalTheme:
+    def terminal_theme(self) -> "rich_theme.TerminalTheme":
+        from rich import terminal_theme as rich_theme
+
         return {
             RenderTheme.LIGHT: rich_theme.DEFAULT_TERMINAL_THEME,
             RenderTheme.MONOKAI: rich_theme.MONOKAI,
@@ -157,47 +456,14 @@ class RenderTheme(str, Enum):
         }[self]
 
 
-Command = t.Union[TyperCommand, TyperGroup]
-
-"""
-Callbacks that return a dict of kwargs to pass to various renderer functions
-must all have the RenderCallback function signature:
-"""
-RenderCallback = t.Callable[
-    [
-        "TyperDirective",  # directive - the TyperDirective instance
-        str,  # name - the name of the command
-        Command,  # command - the command instance
-        click.Context,  # ctx - the click.Context instance
-        t.Optional[click.Context],  # parent - the parent click.Context instance
-    ],
-    t.Dict[str, t.Any],
-]
-
-"""
-Custom render options can be provided at a python path that resolves to the
-following type. Either a dictionary of kwargs to pass to the relevant function
-or a callable that returns a dictionary of kwargs to pass to the relevant function
-"""
-RenderOptions = t.Union[t.Dict[str, t.Any], RenderCallback]
-
-
-class TyperDirective(rst.Directive):
+class LazyTyperDirective(rst.Directive):
     """
-    A directive that renders a Typer app or Click command help text as either
-    an html, text literal or svg image node depending on the builder and
-    configuraton.
-
-    Ex usage.
-
-    .. code-block:: rst
-
-        .. typer:: import.path.to.typer.app:subcommand
-            :prog: script_name
+    The directive registered as ``typer``. It declares the arguments and options
+    of the directive and hands off to
+    :class:`~sphinxcontrib.typer.render.TyperDirective` when it runs, so typer and
+    rich are only imported once a directive is used.
     """
 
-    logger = logging.getLogger("sphinxcontrib.typer")
-
     has_content = False
     required_arguments = 1
     option_spec = {
@@ -207,6 +473,7 @@ class TyperDirective(rst.Directive):
         "markup-mode": directives.unchanged,
         "width": directives.nonnegative_int,
         "theme": RenderTheme,
+        "dark-theme": RenderTheme,
         "svg-kwargs": directives.unchanged,
         "text-kwargs": directives.unchanged,
         "html-kwargs": directives.unchanged,
@@ -217,463 +484,286 @@ class TyperDirective(rst.Directive):
         "convert-png": directives.unchanged,
     }
 
-    # resolved options
-    prog_name: str
-    nested: bool
-    make_sections: bool
-    width: int
-    iframe_height: t.Optional[int] = None
-    typer_convert_png: bool = False
+    def run(self) -> t.List[nodes.Node]:
+        from sphinxcontrib.typer.render import TyperDirective
 
-    console: Console
-    parent: click.Context
+        return TyperDirective(
+            self.name,
+            self.arguments,
+            self.options,
+            self.content,
+            self.lineno,
+            self.content_offset,
+            self.block_text,
+            self.state,
+            self.state_machine,
+        ).run()
 
-    theme: RenderTheme = RenderTheme.LIGHT
-    preferred: t.Optional[RenderTarget] = None
 
-    markup_mode: MarkupMode
+class DeferredDirective:
+    """
+    Stands in for the :class:`TyperDirective` when hook functions are invoked
+    outside of a directive, for example from build event handlers after the read
+    phase. It provides the parts of the directive interface the hook functions rely
+    on.
+
+    Deferred artifact conversions (see :confval:`typer_max_workers`) expose these
+    attributes of the directive that queued them: ``arguments``, ``options``,
+    ``builder``, ``target``, ``theme``, ``width``, ``prog_name`` and
+    ``iframe_height``. In process workers ``env.app.config`` holds only the
+    ``typer_*`` configuration values.
+
+    :param env: The Sphinx build environment
+    :param attrs: Any additional directive attributes to expose (e.g. target)
+    """
 
-    # the console_kwargs option can be a dict or a callable that returns a dict, the callable
-    # must conform to the RenderOptions signature
-    console_kwargs: RenderOptions
-    html_kwargs: RenderOptions
-    svg_kwargs: RenderOptions
-    text_kwargs: RenderOptions
+    logger = logging.getLogger("sphinxcontrib.typer")
 
-    target: RenderTarget
+    iframe_height: t.Optional[int] = None
 
-    builder_targets = {
-        **{
-            builder: [RenderTarget.SVG, RenderTarget.HTML, RenderTarget.TEXT]
-            for builder in [
-                "html",
-                "dirhtml",
-                "singlehtml",
-                "htmlhelp",
-                "qthelp",
-                "devhelp",
-            ]
-        },
-        "epub": [RenderTarget.HTML, RenderTarget.SVG, RenderTarget.TEXT],
-        **{
-            builder: [RenderTarget.SVG, RenderTarget.TEXT]
-            for builder in ["latex", "latexpdf", "texinfo"]
-        },
-        **{builder: [RenderTarget.TEXT] for builder in ["text", "gettext"]},
-    }
+    def __init__(self, env, **attrs):
+        self.env = env
+        for attr, value in attrs.items():
+            setattr(self, attr, value)
 
-    @property
-    def builder(self) -> str:
-        return self.env.app.builder.name
+    def debug(self, message: str) -> None:
+        self.logger.debug(message)
 
-    def uuid(self, normal_cmd: str) -> str:
-        """
-        Get a repeatable unique hash id for a given directive instance and command.
+    def info(self, message: str) -> None:
+        self.logger.info(message)
 
-        This is used to generate repeatable unique filenames for any build artifacts
-        like svg -> pdf conversions.
+    def warning(self, message: str) -> None:
+        self.logger.warning(message)
 
-        :param normal_cmd: The normalized command name
-        """
-        # Contextual information
-        source = self.state_machine.get_source_and_line()[0]
-        line_number = self.state_machine.get_source_and_line()[1]
-        source = os.path.relpath(source, self.env.app.builder.srcdir)
-        return hashlib.sha256(
-            f"{source}.{line_number}[{normal_cmd}]".encode("utf-8")
-        ).hexdigest()[:8]
+    def error(self, message: str) -> ExtensionError:
+        return ExtensionError(message)
 
-    def import_object(
-        self,
-        obj_path: t.Optional[str],
-        accessor: t.Callable[[t.Any, str, t.Any], t.Any] = lambda obj, attr, _: getattr(
-            obj, attr
-        ),
-    ) -> t.Any:
-        """
-        Imports an arbitrary object from a python string path.
-        Delimiters can be '.', '::' or ':'.
+    def severe(self, message: str) -> ExtensionError:
+        return ExtensionError(message)
 
-        :param obj_path: The python path to the object, if False, returns None
-        """
-        if not obj_path:
-            return None
-        parts = re.split(r"::|[.:]", obj_path)
-        tries = 1
-        try:
-            while True:
-                # walk up the import path until we find something importable
-                # then walk down the path fetching all the attributes
-                # this allows import strings to reach into nested class
-                # attributes
-                try:
-                    tries += 1
-                    try_path = ".".join(parts[0 : -(tries - 1)])
-                    obj = import_module(try_path)
-                    file_spec = getattr(find_spec(try_path), "origin", None)
-                    if file_spec:
-                        self.env.note_dependency(file_spec)
-                    for attr in parts[-(tries - 1) :]:
-                        obj = accessor(obj, attr, try_path)
-                    break
-                except (ImportError, ModuleNotFoundError):
-                    if tries >= len(parts):
-                        raise
-
-        except (Exception, SystemExit) as exc:
-            err_msg = f'Failed to import "{obj_path}"'
-            if isinstance(exc, SystemExit):
-                err_msg += "The module appeared to call sys.exit()."
-            else:
-                err_msg += "The following exception was raised:\n{}".format(
-                    traceback.format_exc()
-                )
 
-            raise self.severe(err_msg)
+class typer_artifact(nodes.General, nodes.Element):
+    """
+    A placeholder for an image whose file is written by a deferred artifact job.
+    It is replaced by an image node when the doctree is resolved, after the file
+    has been written.
+    """
 
-        return obj
 
-    def load_root_command(self, typer_path: str) -> Command:
-        """
-        Load the module.
+class typer_payload(nodes.General, nodes.Element):
+    """
+    A placeholder for raw markup that is kept out of the doctree. It holds only the
+    content hash of the markup, which is read back from the payload store and
+    substituted when the doctree is resolved. See :confval:`typer_payload_store`.
+    """
 
-        :param typer_path: The python path to the Typer app instance.
-        """
 
-        def resolve_root_command(obj):
-            if isinstance(obj, (TyperCommand, TyperGroup)):
-                return obj
-
-            # use lenient duck typing check incase obj is a proxy for a Typer instance
-            if isinstance(obj, Typer) or isinstance(
-                getattr(obj, "info", None), TyperInfo
-            ):
-                return get_typer_command(obj)
-
-            if callable(obj):
-                ret = obj()
-                if isinstance(ret, Typer) or isinstance(
-                    getattr(ret, "info", None), TyperInfo
-                ):
-                    return get_typer_command(ret)
-                if isinstance(ret, (TyperCommand, TyperGroup)):
-                    return ret
-
-            raise self.error(
-                f'"{typer_path}" of type {type(obj)} is not a Typer app or command.'
-            )
+class typer_pending(nodes.General, nodes.Element):
+    """
+    A placeholder for the help of a command that is rendered when the document is
+    written. It holds the command path and the arguments and options of the
+    directive that documents it. See :confval:`typer_defer_render`.
+    """
 
-        def access_command(obj, attr, imprt_path) -> Command:
-            attr_obj = None
-            try:
-                attr_obj = getattr(obj, attr)
-                return resolve_root_command(attr_obj)
-            except Exception:
-                try:
-                    self.parent = TyperContext(
-                        resolve_root_command(obj),
-                        # we can't trust the name attribute for the first
-                        # command - but it is probably the best bet for
-                        # subsequent commands - so if this is a nested
-                        # import pull out the name attribute if it exists
-                        # otherwise we use the last successful import path
-                        # part because it is probably the module with main
-                        info_name=(
-                            (
-                                getattr(obj, "name", "")
-                                if getattr(self, "parent", None)
-                                else ""
-                            )
-                            or imprt_path.split(".")[-1]
-                        ),
-                        parent=getattr(self, "parent", None),
-                    )
-                    cmds = _filter_commands(self.parent, [attr])
-                    if cmds:
-                        return cmds[0]
-                except (IndexError, rst.DirectiveError):
-                    if attr_obj:
-                        return attr_obj
-                raise
 
-        return resolve_root_command(
-            self.import_object(typer_path, accessor=access_command)
-        )
+def payload_dir(app: application.Sphinx) -> Path:
+    """
+    The directory rendered markup is stored in when :confval:`typer_payload_store`
+    is enabled. It lives beside the doctrees so it persists across incremental
+    builds.
+    """
+    return Path(app.doctreedir) / "typer_payloads"
 
-    def get_html(self, **options):
-        return self.console.export_html(
-            **{"theme": self.theme.terminal_theme, **options, "clear": False}
-        )
 
-    def get_svg(self, **options):
-        return self.console.export_svg(
-            **{"theme": self.theme.terminal_theme, **options, "clear": False}
-        )
+def store_payload(env, markup: str, format: str = "html") -> typer_payload:
+    """
+    Write raw markup to the payload store and return a placeholder node for it.
+    Payloads are named by their content hash so identical markup is stored once.
 
-    def get_text(self, **options):
-        return self.console.export_text(**{**options, "clear": False})
+    :param env: The Sphinx build environment
+    :param markup: The raw markup
+    :param format: The format of the raw node the markup is substituted as
+    :return: The placeholder node
+    """
+    key = DiskCache.key("payload", markup)
+    path = payload_dir(env.app) / key
+    if not path.is_file():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(markup, encoding="utf-8")
+        os.replace(tmp, path)
+    if not hasattr(env, "typer_payloads"):
+        env.typer_payloads = {}
+    env.typer_payloads.setdefault(env.docname, set()).add(key)
+    return typer_payload(key=key, format=format)
+
+
+class ArtifactJob(t.NamedTuple):
+    """
+    A deferred artifact conversion - calls the conversion hook to write the
+    rendered help to path.
+    """
 
-    def generate_nodes(
-        self,
-        name: str,
-        command: click.Command,
-        parent: t.Optional[click.Context],
-    ) -> t.List[nodes.section]:
-        """
-        Generate the relevant Sphinx nodes.
+    hook: t.Union[str, t.Callable[..., None]]
+    rendered: str
+    path: str
+    target: RenderTarget
+    svg_path: t.Optional[str] = None  # also write the svg source here
+    command: str = ""
+    # the DEFERRED_ATTRS of the directive, for hooks run outside of it
+    directive: t.Dict[str, t.Any] = {}
 
-        Generate node help for a Typer command or group.
+    @property
+    def phase(self) -> str:
+        return "svg2pdf" if self.svg_path else "convert_png"
 
-        :param command: Instance of a Typer command or group
-        :param parent: Instance of `typer.models.Context`, or None
-        :returns: A list of nested docutil nodes
+    def deferred(self, env) -> DeferredDirective:
         """
-        ctx = TyperContext(
-            command,
-            info_name=name,
-            parent=parent,
-            terminal_width=self.width,
-            max_content_width=self.width,
-        )
-
-        _add_dependency(self.env, command)
-
-        if command.hidden:
-            return []
-
-        normal_cmd = section_title = _command_path(ctx).replace(":", " ")
-        section_id = nodes.make_id(section_title)
-        if not getattr(self, "parent", None):
-            section_title = section_title.split(" ")[-1]
+        The stand in directive the hook is passed when the job is run outside of
+        the directive that queued it.
+        """
+        return DeferredDirective(env, **{**self.directive, "target": self.target})
 
-        section = (
-            nodes.section(
-                "",
-                nodes.title(text=section_title),
-                ids=[section_id],
-                names=[nodes.fully_normalize_name(section_title)],
-            )
-            if self.make_sections
-            else nodes.container()
-        )
-        self.env.domaindata["std"].setdefault("typer", {})[section_id] = (
-            self.env.docname,
-            section_id,
-            normal_cmd,
-        )
+    def run(self, directive: t.Union["TyperDirective", DeferredDirective]) -> bool:
+        """
+        Write the artifact unless it already exists. Artifact names are content
+        addressed so an existing file is always up to date. Files are written to a
+        temporary path first so an interrupted conversion is never mistaken for a
+        finished one.
 
-        # Summary
-        def resolve_options(
-            options: RenderOptions, parameter: str
-        ) -> t.Dict[str, t.Any]:
-            if callable(options):
-                options = options(self, name, command, ctx, parent)
-            if isinstance(options, dict):
-                return options
-            raise self.severe(
-                f"Invalid {parameter}, must be a dict or callable, got {type(options)}"
+        :return: True if the artifact was written, False if it already existed or
+            the hook did not write it
+        """
+        if self.svg_path and not Path(self.svg_path).is_file():
+            self._write(self.svg_path, lambda tmp: Path(tmp).write_text(self.rendered))
+        if Path(self.path).is_file():
+            return False
+        token = _artifact_command.set(self.command)
+        try:
+            return self._write(
+                self.path,
+                lambda tmp: get_function(self.hook)(directive, self.rendered, tmp),
             )
+        finally:
+            _artifact_command.reset(token)
 
-        def get_console(stderr: bool = False) -> Console:
-            self.console = Console(
-                **{
-                    "theme": Theme(
-                        {
-                            "option": typer_rich_utils.STYLE_OPTION,
-                            "switch": typer_rich_utils.STYLE_SWITCH,
-                            "negative_option": typer_rich_utils.STYLE_NEGATIVE_OPTION,
-                            "negative_switch": typer_rich_utils.STYLE_NEGATIVE_SWITCH,
-                            "types": typer_rich_utils.STYLE_TYPES,
-                            "types_sep": typer_rich_utils.STYLE_TYPES_SEPARATOR,
-                            "usage": typer_rich_utils.STYLE_USAGE,
-                        },
-                    ),
-                    "highlighter": typer_rich_utils.highlighter,
-                    "color_system": None
-                    if self.target is RenderTarget.TEXT
-                    else typer_rich_utils.COLOR_SYSTEM,
-                    "force_terminal": typer_rich_utils.FORCE_TERMINAL,
-                    "width": self.width or typer_rich_utils.MAX_WIDTH,
-                    "stderr": stderr,
-                    # overrides any defaults above
-                    **resolve_options(self.console_kwargs, "console-kwargs"),
-                    "record": True,
-                }
-            )
-            return self.console
-
-        # todo
-        # typer provides no official way to alter the console that prints out the help
-        # command so we have to monkey patch it - revisit in future if this changes!
-        # we also monkey patch get_help incase its a click command
-        orig_getter = typer_rich_utils._get_rich_console
-        orig_format_help = command.format_help
-        command.rich_markup_mode = getattr(
-            self, "markup_mode", getattr(command, "rich_markup_mode", "markdown")
-        )
-        command.format_help = TyperGroup.format_help.__get__(command, command.__class__)
-        typer_rich_utils._get_rich_console = get_console
-        with contextlib.redirect_stdout(io.StringIO()):
-            command.get_help(ctx)
-        typer_rich_utils._get_rich_console = orig_getter
-        command.format_help = orig_format_help
-        ##############################################################################
-
-        export_options = resolve_options(
-            getattr(self, f"{self.target}_kwargs", {}), f"{self.target}-kwargs"
+    def written(self, env, written: bool, seconds: float) -> None:
+        """
+        Report a finished job - emits ``typer-artifact-written`` and records its
+        timing. Nothing is reported if the hook did not write the artifact.
+        """
+        if not Path(self.path).is_file():
+            return
+        emit_event(
+            env,
+            "typer-artifact-written",
+            self.command,
+            self.target,
+            size=Path(self.path).stat().st_size,
+            duration=seconds,
+            cache_hit=not written,
+            path=self.path,
         )
 
-        rendered = getattr(self, f"get_{self.target}")(
-            **({"title": section_title} if self.target is RenderTarget.SVG else {}),
-            **export_options,
+    @staticmethod
+    def _write(path: str, write: t.Callable[[str], t.Any]) -> bool:
+        dest = Path(path)
+        tmp = dest.with_name(
+            f"{dest.stem}.{os.getpid()}.{threading.get_ident()}.tmp{dest.suffix}"
         )
+        try:
+            write(str(tmp))
+            if not tmp.is_file():
+                logger.warning("typer: the conversion hook did not write %s", dest)
+                return False
+            os.replace(tmp, dest)
+            return True
+        finally:
+            tmp.unlink(missing_ok=True)
 
-        def to_path(name: str, ext: str) -> Path:
-            return (
-                Path(self.env.app.builder.outdir)
-                / f"{name.replace(':', '_').replace(' ', '_')}_{self.uuid(name)}.{ext}"
-            )
 
-        # Image URIs must be relative to the document's directory, not srcdir,
-        # so that Sphinx can locate the file when the directive appears in a
-        # document nested inside a subdirectory (e.g. via autodoc).
-        # See https://github.com/sphinx-contrib/typer/issues/58
-        doc_dir = Path(self.env.srcdir) / Path(self.env.docname).parent
+_worker_env = None
 
-        if self.typer_convert_png:
-            png_path = to_path(normal_cmd, "png")
-            get_function(self.env.app.config.typer_convert_png)(
-                self, rendered, png_path
-            )
-            section += nodes.image(
-                uri=os.path.relpath(png_path, doc_dir),
-                alt=section_title,
-            )
-        elif self.target == RenderTarget.HTML:
-            section += nodes.raw(
-                "",
-                get_function(self.env.app.config.typer_render_html)(
-                    self, normal_cmd, rendered
-                ),
-                format="html",
-            )
-        elif self.target == RenderTarget.SVG:
-            if "html" in self.builder:
-                section += nodes.raw("", rendered, format="html")
-            else:
-                svg_path = to_path(normal_cmd, "svg")
-                pdf_path = to_path(normal_cmd, "pdf")
-                svg_path.write_text(rendered)
-                get_function(self.env.app.config.typer_svg2pdf)(
-                    self, rendered, pdf_path
-                )
-                section += nodes.image(
-                    uri=os.path.relpath(pdf_path, doc_dir),
-                    alt=section_title,
-                )
 
-        elif self.target == RenderTarget.TEXT:
-            section += nodes.literal_block("", rendered)
-        else:
-            raise self.severe(f"Invalid typer render target: {self.target}")
-
-        # recurse through subcommands if we should
-        if isinstance(command, TyperGroup):
-            commands = _filter_commands(ctx, command.list_commands(ctx))
-            for command in commands:
-                if self.nested:
-                    section.extend(
-                        self.generate_nodes(command.name, command, parent=ctx)
-                    )
-                else:
-                    _add_dependency(self.env, command)
-        return [section]
+def _init_artifact_worker(config: t.Dict[str, t.Any]) -> None:
+    """
+    Initialize a process pool worker with just enough of a build environment to
+    run the conversion hooks.
+    """
+    from multiprocessing.util import Finalize
+    from types import SimpleNamespace
+
+    global _worker_env
+    app = SimpleNamespace(
+        config=SimpleNamespace(**config),
+        typer_web_drivers=WebDriverPool(
+            config["typer_get_web_driver"], config["typer_web_driver_pool_size"]
+        ),
+    )
+    Finalize(app.typer_web_drivers, app.typer_web_drivers.close, exitpriority=10)
+    _worker_env = SimpleNamespace(app=app)
 
-    def run(self) -> t.Iterable[nodes.section]:
-        self.env = self.state.document.settings.env
 
-        command = self.load_root_command(self.arguments[0])
+def _run_artifact_job(job: ArtifactJob) -> t.Tuple[bool, float]:
+    start = time.perf_counter()
+    written = job.run(job.deferred(_worker_env))
+    return written, time.perf_counter() - start
 
-        self.make_sections = "make-sections" in self.options
-        self.nested = "show-nested" in self.options
-        self.prog_name = self.options.get("prog", "")
-        if "markup-mode" in self.options:
-            self.markup_mode = self.options["markup-mode"]
 
-        if not self.prog_name:
-            try:
-                self.prog_name = (
-                    command.callback.__module__.split(".")[-1]
-                    if hasattr(command, "callback") and not hasattr(self, "parent")
-                    else re.split(r"::|[.:]", self.arguments[0])[-1]
-                )
-            except Exception as err:
-                raise self.severe(
-                    "Unable to determine program name, please specify using :prog:"
-                ) from err
-
-        self.prog_name = self.prog_name.strip()
-
-        self.width = self.options.get("width", 65)
-        self.iframe_height = self.options.get("iframe-height", None)
-
-        # if no builders supplied but convert-png is set,
-        # force png for all builders, otherwise require the builder
-        # to be in the list of typer_convert_png builders
-        self.typer_convert_png = "convert-png" in self.options
-        if self.typer_convert_png:
-            builders = self.options["convert-png"].strip()
-            self.typer_convert_png = self.builder in builders if builders else True
-
-        for trg in ["console", *list(RenderTarget)]:
-            setattr(
-                self,
-                f"{trg}_kwargs",
-                self.import_object(self.options.get(f"{trg}-kwargs", None)) or {},
-            )
+def iframe_height_key(env, html_page: str) -> str:
+    """
+    The key measured iframe heights are stored under. Heights depend only on the
+    exact html page and the configured padding.
 
-        self.preferred = self.options.get("preferred", None)
-        self.theme = self.options.get("theme", self.theme)
+    :param env: The Sphinx build environment
+    :param html_page: The full html document that will be rendered in the iframe
+    """
+    return DiskCache.key(
+        "iframe-height", html_page, env.app.config.typer_iframe_height_padding
+    )
 
-        builder_targets = {}
-        for builder_target in self.options.get("builders", "").split(":"):
-            if builder_target.strip():
-                builder, targets = builder_target.split("=")[0:2]
-                builder_targets[builder.strip()] = [
-                    RenderTarget(target.strip()) for target in targets.split(",")
-                ]
 
-        builder_targets = {**self.builder_targets, **builder_targets}
+def get_iframe_height(env, key: str) -> t.Optional[int]:
+    """
+    Fetch a previously measured iframe height from the environment or from the
+    on-disk cache which persists across clean builds.
 
-        if self.typer_convert_png:
-            self.target = (
-                self.preferred
-                or (builder_targets.get(self.builder, []) or [RenderTarget.SVG])[0]
-            )
-        elif self.builder not in builder_targets:
-            self.target = self.preferred or RenderTarget.TEXT
-            self.logger.debug(
-                "Unable to resolve render target for builder: %s - using: %s",
-                self.builder,
-                self.target,
-            )
-        else:
-            supported = builder_targets[self.builder]
-            self.target = (
-                self.preferred if self.preferred in supported else supported[0]
-            )
+    :param env: The Sphinx build environment
+    :param key: The key returned by :func:`iframe_height_key`
+    """
+    if not hasattr(env, "iframe_heights"):
+        env.iframe_heights = {}
+    if docname := _current_docname(env):
+        # heights no document uses are dropped, see prune_iframe_heights
+        if not hasattr(env, "typer_iframe_keys"):
+            env.typer_iframe_keys = {}
+        env.typer_iframe_keys.setdefault(docname, set()).add(key)
+    if (height := env.iframe_heights.get(key, None)) is not None:
+        return height
+    cache = getattr(env.app, "typer_cache", None)
+    if cache and (height := cache.get(key)) is not None:
+        env.iframe_heights[key] = int(height)
+        return env.iframe_heights[key]
+    return None
+
+
+def set_iframe_height(env, key: str, height: int) -> None:
+    """
+    Store a measured iframe height in the environment and the on-disk cache.
 
-        parent = getattr(self, "parent", None)
-        if parent and self.options.get("prog", None):
-            # we unset this because we're not at the root command and this gets
-            # messed up for whatever reason
-            # https://github.com/sphinx-contrib/typer/issues/24
-            parent.info_name = ""
-        return self.generate_nodes(self.prog_name, command, parent)
+    :param env: The Sphinx build environment
+    :param key: The key returned by :func:`iframe_height_key`
+    :param height: The measured height including padding
+    """
+    if not hasattr(env, "iframe_heights"):
+        env.iframe_heights = {}
+    env.iframe_heights[key] = height
+    if cache := getattr(env.app, "typer_cache", None):
+        cache.set(key, str(height))
 
 
 def typer_get_iframe_height(
-    directive: TyperDirective, normal_cmd: str, html_page: str
+    directive: "TyperDirective", normal_cmd: str, html_page: str
 ) -> int:
     """
     The default iframe height calculation function. The iframe height resolution proceeds as
@@ -681,63 +771,331 @@ def typer_get_iframe_height(
 
     1) Return the global iframe-height parameter if one was supplied as a parameter on the
        directive.
-    2) Check for a cached height value.
+    2) Check for a cached height value. Heights are cached by a hash of the html page
+       and padding, in the environment and in the on-disk cache (see
+       config.typer_cache_dir) so they persist across clean builds.
     3) Attempt to use Selenium to dynamically determine the height of the iframe. Padding will
        be added from the config.typer_iframe_height_padding configuration value. The resulting
        height is then cached if that path is not None. If the attempt to use Selenium fails
-       (it is not installed) a warning is issued and a default height of 600 is returned.
+       (it is not installed) a warning is issued and the height is estimated by
+       :func:`typer_estimate_iframe_height` instead. Once a web driver has failed to
+       start, the heights of all later commands are estimated without another attempt
+       or warning.
+
+    :param directive: The TyperDirective instance
+    :param normal_cmd: The normalized name of the command.
+        (Subcommands are delimited by :)
+    :param html_page: The full html document that will be rendered in the iframe
+    """
+    if directive.iframe_height is not None:
+        return directive.iframe_height
+
+    key = iframe_height_key(directive.env, html_page)
+    if (height := get_iframe_height(directive.env, key)) is not None:
+        return height
+
+    pool = getattr(directive.env.app, "typer_web_drivers", None)
+    if pool is not None and pool.failure is not None:
+        # already reported, do not try to start a driver again
+        return typer_estimate_iframe_height(directive, normal_cmd, html_page)
+    try:
+        with acquire_web_driver(directive, normal_cmd) as driver:
+            # use base64 to avoid issues with special characters
+            driver.get(
+                f"data:text/html;base64,"
+                f"{base64.b64encode(html_page.encode('utf-8')).decode()}"
+            )
+            height = (
+                int(
+                    driver.execute_script(
+                        "return document.documentElement.getBoundingClientRect().height"
+                    )
+                )
+                + directive.env.app.config.typer_iframe_height_padding
+            )
+    except (ImportError, rst.DirectiveError, ExtensionError) as err:
+        directive.logger.warning(
+            "Unable to measure the iframe height of %s with selenium, estimating "
+            "it instead: %s",
+            normal_cmd,
+            err,
+        )
+        return typer_estimate_iframe_height(directive, normal_cmd, html_page)
+    set_iframe_height(directive.env, key, height)
+    return height
+
+
+def typer_estimate_iframe_height(
+    directive: "TyperDirective",
+    normal_cmd: str,
+    html_page: str,
+    line_height: int = RICH_HTML_LINE_HEIGHT,
+    chrome_height: int = RICH_HTML_CHROME_HEIGHT,
+) -> int:
+    """
+    A browserless iframe height calculation function. Rich knows exactly how many
+    lines it rendered, and the page produced by ``console.export_html`` lays out
+    those lines with fixed font metrics. So the height is estimated as the number of
+    rendered lines times the line height, plus the margins of the template, plus
+    the config.typer_iframe_height_padding configuration value. To use this
+    function instead of Selenium set
+    ``typer_get_iframe_height = "sphinxcontrib.typer.typer_estimate_iframe_height"``
 
     :param directive: The TyperDirective instance
     :param normal_cmd: The normalized name of the command.
         (Subcommands are delimited by :)
     :param html_page: The full html document that will be rendered in the iframe
+    :param line_height: The height of a rendered line of help text in pixels
+    :param chrome_height: The height of the template around the help text in pixels
     """
     if directive.iframe_height is not None:
         return directive.iframe_height
+    match = _HTML_CODE_BLOCK.search(html_page)
+    code = match.group(1) if match else html_page
+    lines = code.count("\n") + (0 if code.endswith("\n") else 1)
+    return (
+        lines * line_height
+        + chrome_height
+        + directive.env.app.config.typer_iframe_height_padding
+    )
+
 
-    if not hasattr(directive.env, "iframe_heights"):
-        directive.env.iframe_heights = {}
+def defer_iframe_height(
+    directive: "TyperDirective", normal_cmd: str, html_page: str
+) -> t.Union[int, str]:
+    """
+    Queue the html page to have its height measured in a batch with all of the other
+    pages at the end of the read phase (see ``typer_iframe_height_batch``). If the
+    height is already known it is returned, otherwise a placeholder is returned that
+    will be substituted with the measured height when the doctree is resolved.
 
-    if height := directive.env.iframe_heights.get(normal_cmd, None):
+    :param directive: The TyperDirective instance
+    :param normal_cmd: The normalized name of the command.
+        (Subcommands are delimited by :)
+    :param html_page: The full html document that will be rendered in the iframe
+    """
+    key = iframe_height_key(directive.env, html_page)
+    if (height := get_iframe_height(directive.env, key)) is not None:
         return height
+    if not hasattr(directive.env, "typer_iframe_queue"):
+        directive.env.typer_iframe_queue = {}
+    directive.env.typer_iframe_queue[key] = html_page
+    return f"typer-iframe-height:{key}"
+
+
+def prune_iframe_heights(app: application.Sphinx, env) -> None:
+    """
+    Drop the iframe heights that no document uses any more, so the environment
+    does not grow with every edit. Measurements persist in the on-disk cache.
+    """
+    used = set().union(*getattr(env, "typer_iframe_keys", {}).values())
+    env.iframe_heights = {
+        key: height
+        for key, height in getattr(env, "iframe_heights", {}).items()
+        if key in used
+    }
+
 
-    with get_function(directive.env.app.config.typer_get_web_driver)(
-        directive
-    ) as driver:
-        # use base64 to avoid issues with special characters
-        driver.get(
-            f"data:text/html;base64,"
-            f"{base64.b64encode(html_page.encode('utf-8')).decode()}"
+def measure_iframe_heights(app: application.Sphinx, env) -> None:
+    """
+    Measure the heights of all of the html pages queued by
+    :func:`defer_iframe_height` using as few browser page loads as possible.
+    """
+    queue = getattr(env, "typer_iframe_queue", {})
+    pending = [
+        (key, html_page)
+        for key, html_page in queue.items()
+        if get_iframe_height(env, key) is None
+    ]
+    env.typer_iframe_queue = {}
+    if not pending:
+        return
+    batch_size = max(app.config.typer_iframe_height_batch_size, 1)
+    padding = app.config.typer_iframe_height_padding
+    start = time.perf_counter()
+    try:
+        with acquire_web_driver(
+            DeferredDirective(env), "(batched iframe heights)"
+        ) as driver:
+            driver.get("about:blank")
+            for idx in range(0, len(pending), batch_size):
+                batch = pending[idx : idx + batch_size]
+                heights = driver.execute_async_script(
+                    _MEASURE_IFRAMES_SCRIPT, [html_page for _, html_page in batch]
+                )
+                for (key, _), height in zip(batch, heights):
+                    set_iframe_height(env, key, int(height) + padding)
+    except Exception as err:
+        logger.warning(
+            "Unable to measure iframe heights with selenium, estimating them "
+            "instead: %s",
+            err,
         )
-        height = (
-            int(
-                driver.execute_script(
-                    "return document.documentElement.getBoundingClientRect().height"
+        # estimates are not written to the on-disk cache of measurements
+        directive = DeferredDirective(env)
+        for key, html_page in pending:
+            if key not in env.iframe_heights:
+                env.iframe_heights[key] = typer_estimate_iframe_height(
+                    directive, "", html_page
                 )
+    record_timings(
+        env,
+        "(batched iframe heights)",
+        {"iframe_height": time.perf_counter() - start},
+        docname="",
+    )
+
+
+def run_artifact_jobs(app: application.Sphinx, env) -> None:
+    """
+    Run all of the artifact jobs deferred during the read phase on a pool of
+    ``typer_max_workers`` thread or process workers.
+    """
+    jobs = list(getattr(env, "typer_artifact_jobs", {}).values())
+    env.typer_artifact_jobs = {}
+    if not jobs:
+        return
+
+    executor: Executor = ThreadPoolExecutor(app.config.typer_max_workers)
+
+    def run(job: ArtifactJob) -> t.Tuple[bool, float]:
+        start = time.perf_counter()
+        written = job.run(job.deferred(env))
+        return written, time.perf_counter() - start
+
+    if app.config.typer_artifact_executor == "process":
+        import pickle
+
+        config = {
+            name: app.config[name]
+            for name in (getattr(opt, "name", opt) for opt in app.config)
+            if name.startswith("typer_")
+        }
+        try:
+            pickle.dumps((jobs, config))
+        except Exception as err:
+            logger.warning(
+                "Unable to convert typer artifacts in worker processes, falling "
+                "back to threads. Hook functions must be given as import strings: "
+                "%s",
+                err,
             )
-            + directive.env.app.config.typer_iframe_height_padding
+        else:
+            executor.shutdown()
+            executor = ProcessPoolExecutor(
+                app.config.typer_max_workers,
+                initializer=_init_artifact_worker,
+                initargs=(config,),
+            )
+            run = _run_artifact_job  # type: ignore[assignment]
+
+    with executor:
+        futures = {executor.submit(run, job): job for job in jobs}
+        for future in status_iterator(
+            as_completed(futures),
+            "converting typer artifacts... ",
+            "darkgreen",
+            len(futures),
+            app.verbosity,
+            stringify_func=lambda future: Path(futures[future].path).name,
+        ):
+            job = futures[future]
+            try:
+                written, seconds = future.result()
+            except Exception as err:
+                logger.warning("Unable to write %s: %s", job.path, err)
+            else:
+                job.written(env, written, seconds)
+                # deferred work is not part of any document
+                record_timings(
+                    env, job.command, {job.phase: seconds}, job.target, docname=""
+                )
+
+
+def resolve_artifacts(app: application.Sphinx, doctree: nodes.document, docname):
+    """
+    Replace artifact placeholders with image nodes once their files are written.
+    """
+    for node in list(doctree.findall(typer_artifact)):
+        node.replace_self(
+            nodes.image(uri=node["uri"], candidates={"*": node["uri"]}, alt=node["alt"])
         )
-    directive.env.iframe_heights[normal_cmd] = height
-    return height
+
+
+def resolve_pending(app: application.Sphinx, doctree: nodes.document, docname):
+    """
+    Render the help of any commands whose rendering was deferred until their
+    document is written.
+    """
+    pending = list(doctree.findall(typer_pending))
+    if pending:
+        from sphinxcontrib.typer.render import render_pending
+
+        render_pending(app, docname, pending)
+
+
+def resolve_payloads(app: application.Sphinx, doctree: nodes.document, docname):
+    """
+    Replace payload placeholders with the raw markup they stand in for.
+    """
+    for node in list(doctree.findall(typer_payload)):
+        try:
+            markup = (payload_dir(app) / node["key"]).read_text(encoding="utf-8")
+        except OSError as err:
+            logger.warning(
+                "typer: missing rendered payload %s: %s",
+                node["key"],
+                err,
+                location=(docname, node.line),
+            )
+            markup = ""
+        node.replace_self(nodes.raw("", markup, format=node["format"]))
+
+
+def resolve_iframe_heights(app: application.Sphinx, doctree: nodes.document, docname):
+    """
+    Substitute measured heights for any iframe height placeholders in the doctree.
+    """
+    heights = getattr(app.env, "iframe_heights", {})
+
+    def height(match: re.Match) -> str:
+        return str(heights.get(match.group(1), IFRAME_DEFAULT_HEIGHT))
+
+    for node in list(doctree.findall(nodes.raw)):
+        if _IFRAME_HEIGHT_PLACEHOLDER.search(node.astext()):
+            node.replace_self(
+                nodes.raw(
+                    "",
+                    _IFRAME_HEIGHT_PLACEHOLDER.sub(height, node.astext()),
+                    format=node["format"],
+                )
+            )
 
 
 def typer_render_html(
-    directive: TyperDirective, normal_cmd: str, html_page: str
+    directive: "TyperDirective", normal_cmd: str, html_page: str
 ) -> str:
     """
     The default html rendering function. This function returns the html console
     output wrapped in an iframe. The height of the iframe is dynamically determined
-    by calling the configured typer_get_iframe_height function.
+    by calling the configured typer_get_iframe_height function, or if
+    ``typer_iframe_height_batch`` is enabled, by :func:`defer_iframe_height`.
 
     :param directive: The TyperDirective instance
     :param normal_cmd: The normalized name of the command.
         (Subcommands are delimited by :)
     :param html_page: The html page rendered by console.export_html
     """
-
-    height = get_function(directive.env.app.config.typer_get_iframe_height)(
-        directive, normal_cmd, html_page
-    )
+    if (
+        directive.env.app.config.typer_iframe_height_batch
+        and directive.iframe_height is None
+    ):
+        height = defer_iframe_height(directive, normal_cmd, html_page)
+    else:
+        with profile(directive.env, normal_cmd, "iframe_height", directive.target):
+            height = get_function(directive.env.app.config.typer_get_iframe_height)(
+                directive, normal_cmd, html_page
+            )
     return (
         f'<iframe style="border: none;" width="100%" height="'
         f'{height}px"'
@@ -745,7 +1103,7 @@ def typer_render_html(
     )
 
 
-def typer_svg2pdf(directive: TyperDirective, svg_contents: str, pdf_path: str):
+def typer_svg2pdf(directive: "TyperDirective", svg_contents: str, pdf_path: str):
     """
     The default typer_svg2pdf function. This function uses the cairosvg package to
     convert svg to pdf.
@@ -770,7 +1128,7 @@ def typer_svg2pdf(directive: TyperDirective, svg_contents: str, pdf_path: str):
 
 @contextmanager
 def typer_get_web_driver(
-    directive: TyperDirective,
+    directive: "TyperDirective",
     width: int = SELENIUM_DEFAULT_WINDOW_WIDTH,
     height: int = SELENIUM_DEFAULT_WINDOW_HEIGHT,
 ) -> t.Any:
@@ -874,8 +1232,162 @@ def typer_get_web_driver(
         raise directive.severe("Unable to initialize any webdriver.")
 
 
+class WebDriverPool:
+    """
+    A build scoped pool of warm web drivers. Drivers are started lazily by the
+    ``typer_get_web_driver`` factory the first time one is needed and are reused
+    for subsequent pages - they are reset between uses. All drivers are shut down
+    when the pool is closed at the end of the build.
+
+    If a driver fails to start the pool is broken for the rest of the build, the
+    failure is kept in :attr:`failure` and raised again by every later acquire
+    rather than retrying the startup.
+
+    :param factory: The ``typer_get_web_driver`` factory (or import path to it)
+    :param size: The maximum number of drivers that may be in use at once
+    """
+
+    def __init__(
+        self,
+        factory: t.Union[str, t.Callable[..., t.ContextManager[t.Any]]],
+        size: int = 1,
+    ):
+        self.factory = factory
+        self.size = max(size, 1)
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: t.List[t.Any] = []
+        self._drivers: t.Dict[int, t.Tuple[contextlib.ExitStack, t.Any]] = {}
+        self.failure: t.Optional[Exception] = None
+
+    def _check_process(self):
+        # drivers can not be shared with forked (parallel build) processes, a
+        # child starts its own and shuts them down when it exits
+        if self._pid != os.getpid():
+            from multiprocessing.util import Finalize
+
+            self._init_state()
+            Finalize(self, self.close, exitpriority=10)
+
+    @staticmethod
+    def reset(driver: t.Any, window_size: t.Dict[str, int]) -> None:
+        """
+        Reset a driver to a blank page in its initial state.
+        """
+        with contextlib.suppress(Exception):
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+        if window_size and driver.get_window_size() != window_size:
+            driver.set_window_size(window_size["width"], window_size["height"])
+
+    @contextmanager
+    def acquire(
+        self, directive: "TyperDirective", command: str = ""
+    ) -> t.Iterator[t.Any]:
+        """
+        A context manager that yields a warm web driver from the pool, starting one
+        if none are idle. At most ``size`` drivers will be handed out at once.
+
+        :param directive: The TyperDirective instance
+        :param command: The command path the driver is used for
+        :raises Exception: the startup failure if the pool is broken
+        """
+        self._check_process()
+        start = time.perf_counter()
+        with self._slots:
+            with self._lock:
+                driver = self._idle.pop() if self._idle else None
+            reused = driver is not None
+            if driver is None:
+                if self.failure is not None:
+                    raise self.failure
+                stack = contextlib.ExitStack()
+                try:
+                    driver = stack.enter_context(get_function(self.factory)(directive))
+                except Exception as err:
+                    self.failure = err
+                    raise
+                window_size = None
+                with contextlib.suppress(Exception):
+                    window_size = driver.get_window_size()
+                with self._lock:
+                    self._drivers[id(driver)] = (stack, window_size)
+            else:
+                self.reset(driver, self._drivers[id(driver)][1])
+            emit_event(
+                getattr(directive, "env", None),
+                "typer-webdriver-acquired",
+                command,
+                getattr(directive, "target", None),
+                duration=time.perf_counter() - start,
+                cache_hit=reused,
+            )
+            try:
+                yield driver
+            except BaseException:
+                # the driver may be in an unknown state - do not reuse it
+                with self._lock:
+                    stack, _ = self._drivers.pop(id(driver))
+                with contextlib.suppress(Exception):
+                    stack.close()
+                raise
+            with self._lock:
+                self._idle.append(driver)
+
+    def close(self) -> None:
+        """
+        Shut down all of the drivers in the pool.
+        """
+        with self._lock:
+            drivers, self._drivers, self._idle = self._drivers, {}, []
+        for stack, _ in drivers.values():
+            with contextlib.suppress(Exception):
+                stack.close()
+
+
+@contextmanager
+def acquire_web_driver(
+    directive: "TyperDirective", command: t.Optional[str] = None
+) -> t.Iterator[t.Any]:
+    """
+    A context manager that yields a web driver from the build's
+    :class:`WebDriverPool`. Custom hook functions that need a web driver should use
+    this rather than calling ``typer_get_web_driver`` directly so drivers are
+    reused for the whole build.
+
+    :param directive: The TyperDirective instance
+    :param command: The command path the driver is used for, reported in the
+        ``typer-webdriver-acquired`` event. Defaults to the command of the artifact
+        being converted, if any.
+    """
+    if command is None:
+        command = _artifact_command.get()
+    pool = getattr(directive.env.app, "typer_web_drivers", None)
+    if pool is None:
+        start = time.perf_counter()
+        with get_function(directive.env.app.config.typer_get_web_driver)(
+            directive
+        ) as driver:
+            emit_event(
+                directive.env,
+                "typer-webdriver-acquired",
+                command,
+                getattr(directive, "target", None),
+                duration=time.perf_counter() - start,
+                cache_hit=False,
+            )
+            yield driver
+    else:
+        with pool.acquire(directive, command) as driver:
+            yield driver
+
+
 def typer_convert_png(
-    directive: TyperDirective,
+    directive: "TyperDirective",
     rendered: str,
     png_path: t.Union[str, Path],
     selenium_width: int = SELENIUM_DEFAULT_WINDOW_WIDTH,
@@ -902,66 +1414,63 @@ def typer_convert_png(
     from selenium.webdriver.common.by import By
 
     tag = "code"
-    with get_function(directive.env.app.config.typer_get_web_driver)(
-        directive
-    ) as driver:
-        with tempfile.NamedTemporaryFile(suffix=".html") as tmp:
-            if directive.target is RenderTarget.TEXT:
-                tag = "pre"
-                rendered = f"<html><body><pre>{rendered}</pre></body></html>"
-            elif directive.target is RenderTarget.SVG:
-                tag = "svg"
-                rendered = f"<html><body>{rendered}</body></html>"
-
-            tmp.write(rendered.encode("utf-8"))
-            tmp.flush()
+    with (
+        acquire_web_driver(directive) as driver,
+        tempfile.NamedTemporaryFile(suffix=".html") as tmp,
+    ):
+        if directive.target is RenderTarget.TEXT:
+            tag = "pre"
+            rendered = f"<html><body><pre>{rendered}</pre></body></html>"
+        elif directive.target is RenderTarget.SVG:
+            tag = "svg"
+            rendered = f"<html><body>{rendered}</body></html>"
+
+        tmp.write(rendered.encode("utf-8"))
+        tmp.flush()
+        for _ in range(2):
             driver.get(f"file://{tmp.name}")
-            png = driver.get_screenshot_as_png()
             # Find the element you want a screenshot of
             element = driver.find_element(By.CSS_SELECTOR, tag)
-            pixel_ratio = driver.execute_script("return window.devicePixelRatio")
             # Get the element's location and size
             location = element.location
             size = element.size
-
-            if size["width"] > selenium_width or size["height"] > selenium_height:
-                # if our window is too small, resize it with some padding and try again
-                return typer_convert_png(
-                    directive,
-                    rendered,
-                    png_path,
-                    size["width"] + 100,
-                    size["height"] + 100,
-                )
-
-            # Open the screenshot and crop it to the element
-            im = Image.open(BytesIO(png))
-            left = location["x"] * pixel_ratio
-            top = location["y"] * pixel_ratio
-            if directive.target is RenderTarget.TEXT:
-                # getting the width of the text is actually a bit tricky
-                script = """
-                    const pre = arguments[0];
-                    const textContent = pre.textContent || pre.innerText;
-                    const temporarySpan = document.createElement('span');
-                    document.body.appendChild(temporarySpan);
-
-                    // Copy styles to match formatting
-                    const preStyle = window.getComputedStyle(pre);
-                    temporarySpan.style.fontFamily = preStyle.fontFamily;
-                    temporarySpan.style.fontSize = preStyle.fontSize;
-                    temporarySpan.style.whiteSpace = 'pre';
-                    temporarySpan.textContent = textContent;
-
-                    return temporarySpan.offsetWidth;
-                """
-                width = driver.execute_script(script, element)
-                right = left + width * pixel_ratio
-            else:
-                right = left + size["width"] * pixel_ratio
-            bottom = top + size["height"] * pixel_ratio
-            im = im.crop((left, top, right, bottom))  # Defines crop points
-            im.save(str(png_path))  # Saves the screenshot
+            if size["width"] <= selenium_width and size["height"] <= selenium_height:
+                break
+            # if our window is too small, resize it with some padding and try again
+            selenium_width = size["width"] + 100
+            selenium_height = size["height"] + 100
+            driver.set_window_size(selenium_width, selenium_height)
+        png = driver.get_screenshot_as_png()
+        pixel_ratio = driver.execute_script("return window.devicePixelRatio")
+
+        # Open the screenshot and crop it to the element
+        im = Image.open(BytesIO(png))
+        left = location["x"] * pixel_ratio
+        top = location["y"] * pixel_ratio
+        if directive.target is RenderTarget.TEXT:
+            # getting the width of the text is actually a bit tricky
+            script = """
+                const pre = arguments[0];
+                const textContent = pre.textContent || pre.innerText;
+                const temporarySpan = document.createElement('span');
+                document.body.appendChild(temporarySpan);
+
+                // Copy styles to match formatting
+                const preStyle = window.getComputedStyle(pre);
+                temporarySpan.style.fontFamily = preStyle.fontFamily;
+                temporarySpan.style.fontSize = preStyle.fontSize;
+                temporarySpan.style.whiteSpace = 'pre';
+                temporarySpan.textContent = textContent;
+
+                return temporarySpan.offsetWidth;
+            """
+            width = driver.execute_script(script, element)
+            right = left + width * pixel_ratio
+        else:
+            right = left + size["width"] * pixel_ratio
+        bottom = top + size["height"] * pixel_ratio
+        im = im.crop((left, top, right, bottom))  # Defines crop points
+        im.save(str(png_path))  # Saves the screenshot
 
 
 _link_regex = re.compile(r"([^<]+)(?:<(.+?)>)?")
@@ -1035,11 +1544,354 @@ def typer_ref_role(name, rawtext, text, lineno, inliner, options={}, content=[])
         return [pending], []
 
 
+def init_build(app: application.Sphinx):
+    """
+    Initialize the build scoped state of the extension.
+    """
+    cache_dir = app.config.typer_cache_dir
+    if cache_dir is None:
+        cache_dir = Path(app.doctreedir) / "typer_cache"
+    app.typer_cache = (
+        DiskCache(Path(app.confdir) / cache_dir, app.config.typer_cache_max_size)
+        if cache_dir
+        else None
+    )
+    app.typer_web_drivers = WebDriverPool(
+        app.config.typer_get_web_driver, app.config.typer_web_driver_pool_size
+    )
+    app.typer_imports = ImportCache()
+
+
+def check_prerender_manifest(app: application.Sphinx) -> t.Optional[int]:
+    """
+    Check that everything recorded in the :confval:`typer_prerender_manifest` is
+    in the render cache, and that its artifacts are in the output directory if
+    they were written there, warning about any that are missing.
+
+    :param app: The Sphinx application
+    :return: The number of missing entries, or None if there is no manifest
+    """
+    setting = app.config.typer_prerender_manifest
+    if not setting:
+        return None
+    path = Path(app.confdir) / setting
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError) as err:
+        logger.warning("Unable to read the typer prerender manifest %s: %s", path, err)
+        return None
+    cache = getattr(app, "typer_cache", None)
+    outdir = Path(app.outdir).resolve()
+    total = missing = 0
+    for run in manifest.get("runs", []):
+        total += len(run["cache"])
+        missing += sum(
+            not (cache and cache.path(key).is_file()) for key in run["cache"]
+        )
+        if run["request"].get("outdir") == str(outdir):
+            total += len(run["artifacts"])
+            missing += sum(not (outdir / name).is_file() for name in run["artifacts"])
+    if missing:
+        logger.warning(
+            "%d of %d entries of the typer prerender manifest %s are missing, "
+            "they will be rendered by this build.",
+            missing,
+            total,
+            path,
+        )
+    return missing
+
+
+def reset_cache_stats(app: application.Sphinx, env, docnames: t.List[str]):
+    env.typer_cache_stats = {}
+    env.typer_profile = {}
+
+
+def cache_stats(env) -> t.Dict[str, int]:
+    """
+    The total render cache hits and misses of the current build.
+    """
+    totals = {"hits": 0, "misses": 0}
+    for stats in getattr(env, "typer_cache_stats", {}).values():
+        for stat, count in stats.items():
+            totals[stat] += count
+    return totals
+
+
+def purge_doc(app: application.Sphinx, env, docname: str):
+    """
+    Remove all of the command references registered by the given document.
+    """
+    commands = env.domaindata["std"].get("typer", {})
+    for section_id, (cmd_docname, *_) in list(commands.items()):
+        if cmd_docname == docname:
+            del commands[section_id]
+    getattr(env, "typer_cache_stats", {}).pop(docname, None)
+    getattr(env, "typer_artifacts", {}).pop(docname, None)
+    getattr(env, "typer_iframe_keys", {}).pop(docname, None)
+    getattr(env, "typer_payloads", {}).pop(docname, None)
+    getattr(env, "typer_signatures", {}).pop(docname, None)
+    getattr(env, "typer_profile", {}).pop(docname, None)
+
+
+def find_outdated(
+    app: application.Sphinx,
+    env,
+    added: t.Set[str],
+    changed: t.Set[str],
+    removed: t.Set[str],
+) -> t.List[str]:
+    """
+    If :confval:`typer_dependencies` is ``"help"``, find the documents whose
+    commands' help signatures have changed since they were read.
+    """
+    signatures = getattr(env, "typer_signatures", {})
+    if app.config.typer_dependencies != "help" or not signatures:
+        return []
+
+    from sphinxcontrib.typer.render import command_signature
+
+    outdated = []
+    for docname, entries in signatures.items():
+        if docname in added | changed | removed:
+            continue
+        for arguments, options, signature in entries:
+            if command_signature(app, docname, arguments, options) != signature:
+                outdated.append(docname)
+                break
+    return outdated
+
+
+def merge_info(app: application.Sphinx, env, docnames: t.Set[str], other):
+    """
+    Merge the data collected by a parallel read worker into the main environment.
+    """
+    env.domaindata["std"].setdefault("typer", {}).update(
+        {
+            section_id: entry
+            for section_id, entry in other.domaindata["std"].get("typer", {}).items()
+            if entry[0] in docnames
+        }
+    )
+    for attr in ("iframe_heights", "typer_iframe_queue", "typer_artifact_jobs"):
+        if hasattr(other, attr):
+            setattr(env, attr, {**getattr(env, attr, {}), **getattr(other, attr)})
+    for attr in (
+        "typer_cache_stats",
+        "typer_artifacts",
+        "typer_iframe_keys",
+        "typer_payloads",
+        "typer_signatures",
+        "typer_profile",
+    ):
+        setattr(
+            env,
+            attr,
+            {
+                **getattr(env, attr, {}),
+                **{
+                    docname: value
+                    for docname, value in getattr(other, attr, {}).items()
+                    if docname in docnames
+                },
+            },
+        )
+
+
+def collect_artifacts(app: application.Sphinx) -> t.List[Path]:
+    """
+    Delete the build artifacts in the output directory that are no longer referenced
+    by any document. Only artifacts this extension wrote are considered, their names
+    are recorded beside the doctrees across builds. Artifacts left over from
+    interrupted conversions are also removed. If :confval:`typer_gc_artifacts` is
+    ``"dry-run"`` the stale artifacts are only reported.
+
+    :param app: The Sphinx application
+    :return: The stale artifacts
+    """
+    mode = app.config.typer_gc_artifacts
+    outdir = Path(app.outdir)
+    record_path = Path(app.doctreedir) / "typer_artifacts.json"
+    try:
+        records = json.loads(record_path.read_text())
+    except (OSError, ValueError):
+        records = {}
+    recorded = set(records.get(str(outdir.resolve()), []))
+    referenced = set().union(*getattr(app.env, "typer_artifacts", {}).values())
+    if not mode or not outdir.is_dir():
+        stale = []
+    else:
+        # temporary files are named <stem>.<pid>.<thread>.tmp<suffix>
+        known = {(Path(name).stem, Path(name).suffix) for name in recorded | referenced}
+        stale = sorted(
+            path
+            for path in outdir.iterdir()
+            if path.is_file()
+            and (
+                (path.name in recorded and path.name not in referenced)
+                or (
+                    path.stem.endswith(".tmp")
+                    and (path.stem.rsplit(".", 3)[0], path.suffix) in known
+                )
+            )
+        )
+    for path in stale:
+        if mode == "dry-run":
+            logger.info("typer: would remove stale artifact %s", path)
+        else:
+            path.unlink(missing_ok=True)
+    if stale and mode != "dry-run":
+        logger.info("typer: removed %d stale artifacts", len(stale))
+    if mode and mode != "dry-run":
+        recorded = set()
+    records[str(outdir.resolve())] = sorted(recorded | referenced)
+    record_path.parent.mkdir(parents=True, exist_ok=True)
+    record_path.write_text(json.dumps(records, indent=2))
+    return stale
+
+
+def collect_payloads(app: application.Sphinx) -> int:
+    """
+    Delete the stored payloads that are no longer referenced by any document.
+
+    :param app: The Sphinx application
+    :return: The number of payloads removed
+    """
+    store = payload_dir(app)
+    if not store.is_dir():
+        return 0
+    referenced = set().union(*getattr(app.env, "typer_payloads", {}).values())
+    removed = 0
+    for path in store.iterdir():
+        if path.name not in referenced:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def write_profile(app: application.Sphinx) -> t.Optional[t.Dict[str, t.Any]]:
+    """
+    Report the time spent in each phase of rendering every command this build.
+    The report is logged and written as json to :confval:`typer_profile`.
+
+    :param app: The Sphinx application
+    :return: The report, or None if profiling is disabled
+    """
+    setting = app.config.typer_profile
+    if not setting:
+        return None
+    commands = sorted(
+        (
+            {
+                "command": command,
+                "docname": docname,
+                "target": record["target"],
+                "total": sum(record["phases"].values()),
+                "phases": record["phases"],
+            }
+            for docname, records in getattr(app.env, "typer_profile", {}).items()
+            for command, record in records.items()
+        ),
+        key=lambda command: (-command["total"], command["command"]),
+    )
+    totals: t.Dict[str, float] = {}
+    targets: t.Dict[str, int] = {}
+    for command in commands:
+        for phase, seconds in command["phases"].items():
+            totals[phase] = totals.get(phase, 0.0) + seconds
+        if command["target"]:
+            targets[command["target"]] = targets.get(command["target"], 0) + 1
+    report = {
+        "totals": dict(sorted(totals.items(), key=lambda item: -item[1])),
+        "targets": targets,
+        "commands": commands,
+    }
+
+    path = (
+        Path(app.outdir) / "typer_profile.json"
+        if setting is True
+        else Path(app.confdir) / setting
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+
+    logger.info("typer profile (%s):", path)
+    for phase, seconds in report["totals"].items():
+        logger.info("  %-16s %8.3fs", phase, seconds)
+    for target, count in targets.items():
+        logger.info("  %-16s %8d commands", target, count)
+    for command in commands[:10]:
+        logger.info("  %8.3fs  %s", command["total"], command["command"])
+    return report
+
+
+def finish_build(app: application.Sphinx, exception: t.Optional[Exception]):
+    """
+    Shut down any running web drivers and the render worker, remove stale
+    artifacts, write the profile report, report cache statistics and evict stale
+    cache entries.
+    """
+    if pool := getattr(app, "typer_web_drivers", None):
+        pool.close()
+    if worker := getattr(app, "typer_render_worker", None):
+        worker.close()
+    if exception is None:
+        collect_artifacts(app)
+        collect_payloads(app)
+        write_profile(app)
+    cache = getattr(app, "typer_cache", None)
+    if not cache:
+        return
+    stats = cache_stats(app.env)
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    if lookups:
+        logger.info(
+            "typer render cache: %d/%d hits (%.0f%%)",
+            stats["hits"],
+            lookups,
+            100 * stats["hits"] / lookups,
+        )
+    if app.config.typer_prerender_manifest and stats.get("misses", 0):
+        logger.warning(
+            "typer render cache: %d renders were not prerendered, the prerender "
+            "manifest does not cover every typer directive.",
+            stats["misses"],
+        )
+    if evicted := cache.prune():
+        logger.info("typer render cache: evicted %d entries", evicted)
+
+
 def setup(app: application.Sphinx) -> t.Dict[str, t.Any]:
     # Need autodoc to support mocking modules
-    app.add_directive("typer", TyperDirective)
+    app.add_directive("typer", LazyTyperDirective)
+    app.add_node(typer_artifact)
+    app.add_node(typer_payload)
+    app.add_node(typer_pending)
+    for event in (
+        "typer-render-start",
+        "typer-render-end",
+        "typer-artifact-written",
+        "typer-webdriver-acquired",
+    ):
+        app.add_event(event)
     app.add_role("typer", typer_ref_role)
     app.connect("missing-reference", resolve_typer_reference)
+    app.connect("builder-inited", init_build)
+    app.connect("builder-inited", check_prerender_manifest)
+    app.connect("env-before-read-docs", reset_cache_stats)
+    app.connect("env-get-outdated", find_outdated)
+    app.connect("env-purge-doc", purge_doc)
+    app.connect("env-merge-info", merge_info)
+    app.connect("env-updated", prune_iframe_heights)
+    app.connect("env-updated", measure_iframe_heights)
+    app.connect("env-updated", run_artifact_jobs)
+    # deferred renders and payloads must be substituted before their iframe
+    # height placeholders
+    app.connect("doctree-resolved", resolve_pending)
+    app.connect("doctree-resolved", resolve_payloads)
+    app.connect("doctree-resolved", resolve_iframe_heights)
+    app.connect("doctree-resolved", resolve_artifacts)
+    app.connect("build-finished", finish_build)
 
     app.add_config_value(
         "typer_render_html", "sphinxcontrib.typer.typer_render_html", "env"
@@ -1050,6 +1902,8 @@ def setup(app: application.Sphinx) -> t.Dict[str, t.Any]:
     )
     app.add_config_value("typer_svg2pdf", "sphinxcontrib.typer.typer_svg2pdf", "env")
     app.add_config_value("typer_iframe_height_padding", 30, "env")
+    app.add_config_value("typer_iframe_height_batch", False, "env")
+    app.add_config_value("typer_iframe_height_batch_size", 50, "")
 
     app.add_config_value(
         "typer_convert_png", "sphinxcontrib.typer.typer_convert_png", "env"
@@ -1057,6 +1911,32 @@ def setup(app: application.Sphinx) -> t.Dict[str, t.Any]:
     app.add_config_value(
         "typer_get_web_driver", "sphinxcontrib.typer.typer_get_web_driver", "env"
     )
+    app.add_config_value("typer_web_driver_pool_size", 1, "")
+    app.add_config_value("typer_max_workers", 0, "", types=(int, type(None)))
+    app.add_config_value("typer_artifact_executor", "thread", "")
+    app.add_config_value("typer_isolate", False, "env")
+    app.add_config_value("typer_profile", False, "", types=(bool, str))
+    app.add_config_value("typer_render_workers", 1, "", types=(int, type(None)))
+    app.add_config_value("typer_gc_artifacts", True, "", types=(bool, str))
+    app.add_config_value("typer_payload_store", False, "env")
+    app.add_config_value("typer_dependencies", "files", "env")
+    app.add_config_value("typer_defer_render", False, "env")
+    app.add_config_value("typer_render_all_targets", False, "")
+    app.add_config_value(
+        "typer_dark_selector",
+        THEME_DEFAULT_DARK_SELECTOR,
+        "env",
+        types=(str, type(None)),
+    )
+    app.add_config_value(
+        "typer_light_selector",
+        THEME_DEFAULT_LIGHT_SELECTOR,
+        "env",
+        types=(str, type(None)),
+    )
+    app.add_config_value("typer_prerender_manifest", None, "")
+    app.add_config_value("typer_cache_dir", None, "")
+    app.add_config_value("typer_cache_max_size", TYPER_CACHE_DEFAULT_MAX_SIZE, "")
 
     return {
         "version": __version__,
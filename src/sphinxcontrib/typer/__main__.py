@@ -0,0 +1,5 @@
+import sys
+
+from sphinxcontrib.typer.prerender import main
+
+sys.exit(main())
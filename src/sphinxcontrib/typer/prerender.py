@@ -0,0 +1,442 @@
+"""
+Render the help of a Typer app ahead of a Sphinx build. The help of every command
+is rendered into the render cache, html iframe heights are measured and pdf and
+png artifacts are written on a pool of worker processes, so the build that follows
+finds everything it needs already done::
+
+    python -m sphinxcontrib.typer prerender mypackage.cli:app --prog mycli \\
+        --show-nested --targets html svg -c doc/source -d doc/build/doctrees
+
+The project's configuration is read from its ``conf.py`` so the renders match the
+build's. A manifest of everything that was rendered is written, see
+:confval:`typer_prerender_manifest`.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sphinx.application import Sphinx
+
+from sphinxcontrib.typer import (
+    ArtifactJob,
+    DeferredDirective,
+    DiskCache,
+    RenderTarget,
+    RenderTheme,
+    __version__,
+    get_function,
+    init_build,
+)
+from sphinxcontrib.typer.render import (
+    _standalone_contexts,
+    _standalone_directive,
+    artifact_path,
+    render_commands,
+)
+
+
+class PrerenderRequest(t.NamedTuple):
+    """
+    The directive options to prerender a command tree with, and where to write
+    its artifacts.
+    """
+
+    app_path: str
+    targets: t.List[RenderTarget]
+    width: int = 65
+    theme: RenderTheme = RenderTheme.LIGHT
+    nested: bool = False
+    prog: str = ""
+    options: t.Dict[str, t.Optional[str]] = {}
+    convert_png: bool = False
+    outdir: t.Optional[str] = None  # write pdf and png artifacts here
+    builder: str = "html"
+
+    def spec(self) -> t.Dict[str, t.Any]:
+        """
+        A json serializable description of the request, as stored in the manifest.
+        """
+        return {
+            **self._asdict(),
+            "targets": [str(target) for target in self.targets],
+            "theme": str(self.theme),
+            "outdir": str(Path(self.outdir).resolve()) if self.outdir else None,
+        }
+
+    def directive_options(self) -> t.Dict[str, t.Optional[str]]:
+        """
+        The directive options to render with, including ``convert-png`` if the
+        renders are converted.
+        """
+        if self.convert_png and "convert-png" not in self.options:
+            return {**self.options, "convert-png": None}
+        return self.options
+
+
+class _RecordingCache(DiskCache):
+    """
+    A render cache that records the keys it has values for.
+    """
+
+    def __init__(self, cache: DiskCache):
+        super().__init__(cache.directory, cache.max_size)
+        self.keys: t.Set[str] = set()
+
+    def get(self, key: str) -> t.Optional[str]:
+        value = super().get(key)
+        if value is not None:
+            self.keys.add(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        super().set(key, value)
+        self.keys.add(key)
+
+
+def load_app(
+    confdir: str,
+    doctreedir: str,
+    outdir: str,
+    overrides: t.Optional[t.Dict[str, t.Any]] = None,
+) -> Sphinx:
+    """
+    Load a Sphinx project's configuration, without building it, and initialize
+    the build state of the extension (the render cache, web drivers and imports).
+
+    :param confdir: The directory containing conf.py
+    :param doctreedir: The build's doctree directory, the default location of the
+        render cache
+    :param outdir: An output directory for the loaded application
+    :param overrides: Configuration values to override
+    """
+    app = Sphinx(
+        confdir,
+        confdir,
+        outdir,
+        doctreedir,
+        buildername="dummy",
+        confoverrides=overrides or {},
+        status=None,
+    )
+    if not hasattr(app, "typer_cache"):
+        app.setup_extension("sphinxcontrib.typer")
+        init_build(app)
+    return app
+
+
+_worker_app: t.Optional[Sphinx] = None
+
+
+def _init_worker(confdir: str, doctreedir: str, overrides: t.Dict[str, t.Any]) -> None:
+    """
+    Load the project's configuration in a prerender worker process.
+    """
+    from multiprocessing.util import Finalize
+
+    global _worker_app
+    _worker_app = load_app(
+        confdir, doctreedir, tempfile.mkdtemp(prefix="typer-prerender-"), overrides
+    )
+    Finalize(
+        _worker_app.typer_web_drivers,
+        _worker_app.typer_web_drivers.close,
+        exitpriority=10,
+    )
+
+
+def _prerender(
+    request: PrerenderRequest, commands: t.List[str]
+) -> t.Tuple[t.List[t.Tuple[str, str]], t.List[str], t.List[str]]:
+    """
+    Prerender some of the commands of a request in a worker process.
+
+    :returns: The (command, target) pairs rendered, the render cache keys and the
+        artifact file names written
+    """
+    app = _worker_app
+    assert app is not None
+    cache = app.typer_cache = _RecordingCache(app.typer_cache)
+    config = app.config
+    rendered: t.List[t.Tuple[str, str]] = []
+    artifacts: t.List[str] = []
+    for command, target, help_txt in render_commands(
+        request.app_path,
+        request.targets,
+        request.width,
+        request.theme,
+        request.nested,
+        request.prog,
+        request.directive_options(),
+        cache=cache,
+        commands=commands,
+        config=config,
+        builder=request.builder,
+    ):
+        rendered.append((command, str(target)))
+        directive = DeferredDirective(app.env, target=target)
+        if target is RenderTarget.HTML and "iframe-height" not in request.options:
+            get_function(config.typer_get_iframe_height)(directive, command, help_txt)
+        if not request.outdir:
+            continue
+
+        def to_path(ext: str, hook: t.Any) -> str:
+            return str(
+                artifact_path(request.outdir, command, ext, help_txt, target, hook)
+            )
+
+        # the artifacts a non-html builder converts the help to
+        if request.convert_png:
+            hook = config.typer_convert_png
+            job = ArtifactJob(
+                hook, help_txt, to_path("png", hook), target, command=command
+            )
+        elif target is RenderTarget.SVG:
+            hook = config.typer_svg2pdf
+            job = ArtifactJob(
+                hook,
+                help_txt,
+                to_path("pdf", hook),
+                target,
+                svg_path=to_path("svg", hook),
+                command=command,
+            )
+        else:
+            continue
+        job.run(directive)
+        artifacts.extend(Path(path).name for path in (job.path, job.svg_path) if path)
+    return rendered, sorted(cache.keys), artifacts
+
+
+def write_manifest(path: Path, request: PrerenderRequest, run: t.Dict) -> None:
+    """
+    Record a prerender run in the manifest, replacing any earlier run of the same
+    request.
+    """
+    manifest = {"version": __version__, "runs": []}
+    if path.is_file():
+        manifest = json.loads(path.read_text())
+    spec = request.spec()
+    manifest["runs"] = [
+        *(prev for prev in manifest.get("runs", []) if prev["request"] != spec),
+        {"request": spec, **run},
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2) + "\n")
+    os.replace(tmp, path)
+
+
+def prerender(
+    request: PrerenderRequest,
+    confdir: t.Optional[str] = None,
+    doctreedir: t.Optional[str] = None,
+    jobs: t.Optional[int] = None,
+    manifest: t.Optional[str] = None,
+    overrides: t.Optional[t.Dict[str, t.Any]] = None,
+) -> t.Dict[str, t.Any]:
+    """
+    Prerender a command tree into the render cache of a Sphinx project. The
+    commands are split between ``jobs`` worker processes.
+
+    :param request: The command tree and directive options to render
+    :param confdir: The directory of the project's conf.py, if None the defaults
+        of the extension are used
+    :param doctreedir: The project's doctree directory, needed if the render
+        cache is in its default location
+    :param jobs: The number of worker processes, the number of cpus by default
+    :param manifest: The path to write the manifest to, ``prerender.json`` in the
+        render cache directory by default
+    :param overrides: Configuration values to override
+    :returns: The manifest entry of this run
+    """
+    overrides = dict(overrides or {})
+    if request.convert_png and not request.outdir:
+        raise ValueError("Converting renders to png requires an output directory")
+    if request.outdir:
+        Path(request.outdir).mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="typer-prerender-") as tmp:
+        if confdir is None:
+            confdir = tmp
+            (Path(tmp) / "conf.py").write_text('extensions = ["sphinxcontrib.typer"]\n')
+        app = load_app(
+            confdir,
+            doctreedir or str(Path(tmp) / "doctrees"),
+            str(Path(tmp) / "out"),
+            overrides,
+        )
+        if not app.typer_cache:
+            raise ValueError("The render cache is disabled (typer_cache_dir = False)")
+        if doctreedir is None and app.config.typer_cache_dir is None:
+            raise ValueError(
+                "The render cache is in the doctree directory by default, give the "
+                "doctree directory or a cache directory"
+            )
+        doctreedir = app.doctreedir
+
+        directive = _standalone_directive(
+            request.app_path,
+            request.targets,
+            request.width,
+            request.theme,
+            request.nested,
+            request.prog,
+            request.directive_options(),
+            app.typer_cache,
+            app.config,
+            request.builder,
+        )
+        commands = [
+            directive.command_title(ctx)[0] for ctx in _standalone_contexts(directive)
+        ]
+        jobs = max(1, min(jobs or os.cpu_count() or 1, len(commands)))
+        chunks = [commands[index::jobs] for index in range(jobs)]
+        initargs = (confdir, str(doctreedir), overrides)
+        if jobs == 1:
+            global _worker_app
+            _worker_app = app
+            try:
+                results = [_prerender(request, chunk) for chunk in chunks]
+            finally:
+                _worker_app = None
+                app.typer_web_drivers.close()
+        else:
+            # workers are spawned, not forked, so they load the project into a fresh
+            # interpreter rather than on top of this process's Sphinx registrations
+            with ProcessPoolExecutor(
+                jobs,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=initargs,
+            ) as executor:
+                results = list(
+                    executor.map(_prerender, [request] * len(chunks), chunks)
+                )
+
+        run = {
+            "cache_dir": str(app.typer_cache.directory.resolve()),
+            "commands": sorted(
+                (pair for result in results for pair in result[0]),
+                key=lambda pair: commands.index(pair[0]),
+            ),
+            "cache": sorted({key for result in results for key in result[1]}),
+            "artifacts": sorted({name for result in results for name in result[2]}),
+        }
+        write_manifest(
+            Path(manifest)
+            if manifest
+            else app.typer_cache.directory / "prerender.json",
+            request,
+            run,
+        )
+        return run
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m sphinxcontrib.typer",
+        description="Tools for the sphinxcontrib-typer Sphinx extension.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    parser_prerender = commands.add_parser(
+        "prerender",
+        help="render a Typer app into the render cache ahead of a Sphinx build",
+        description=__doc__.split("\n\n")[0].replace("\n", " "),
+    )
+    parser_prerender.add_argument("app", help="the import path of the Typer app")
+    parser_prerender.add_argument("--prog", default="", help="the program name")
+    parser_prerender.add_argument("--width", type=int, default=65)
+    parser_prerender.add_argument(
+        "--theme", type=RenderTheme, default=RenderTheme.LIGHT, choices=RenderTheme
+    )
+    parser_prerender.add_argument(
+        "--targets",
+        nargs="+",
+        type=RenderTarget,
+        default=list(RenderTarget),
+        choices=RenderTarget,
+    )
+    parser_prerender.add_argument("--show-nested", action="store_true")
+    parser_prerender.add_argument(
+        "--convert-png",
+        action="store_true",
+        help="convert the renders to png (requires --outdir)",
+    )
+    parser_prerender.add_argument(
+        "-b",
+        "--builder",
+        default="html",
+        help="the name of the builder the renders are for (default: html)",
+    )
+    parser_prerender.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        metavar="NAME[=VALUE]",
+        help="any other directive option, e.g. markup-mode=rich",
+    )
+    parser_prerender.add_argument(
+        "-c", "--confdir", help="the directory of the project's conf.py"
+    )
+    parser_prerender.add_argument(
+        "-d", "--doctreedir", help="the doctree directory of the Sphinx build"
+    )
+    parser_prerender.add_argument(
+        "-o",
+        "--outdir",
+        help="the output directory of the Sphinx build to write pdf and png "
+        "artifacts to",
+    )
+    parser_prerender.add_argument("--cache-dir", help="the render cache directory")
+    parser_prerender.add_argument(
+        "-j", "--jobs", type=int, help="the number of worker processes"
+    )
+    parser_prerender.add_argument("--manifest", help="the manifest path")
+    args = parser.parse_args(argv)
+
+    options = dict(
+        (option.split("=", 1) + [None])[:2]  # type: ignore[misc]
+        for option in args.option
+    )
+    request = PrerenderRequest(
+        args.app,
+        args.targets,
+        width=args.width,
+        theme=args.theme,
+        nested=args.show_nested,
+        prog=args.prog,
+        options=options,
+        convert_png=args.convert_png,
+        outdir=args.outdir,
+        builder=args.builder,
+    )
+    try:
+        run = prerender(
+            request,
+            confdir=args.confdir,
+            doctreedir=args.doctreedir,
+            jobs=args.jobs,
+            manifest=args.manifest,
+            overrides=(
+                {"typer_cache_dir": str(Path(args.cache_dir).resolve())}
+                if args.cache_dir
+                else {}
+            ),
+        )
+    except ValueError as err:
+        parser_prerender.error(str(err))
+    print(
+        f"Prerendered {len(run['commands'])} commands into {run['cache_dir']} "
+        f"({len(run['cache'])} cache entries, {len(run['artifacts'])} artifacts)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
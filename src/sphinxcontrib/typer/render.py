@@ -0,0 +1,1937 @@
+"""
+The Typer and rich machinery behind the ``typer`` directive. This module is
+imported the first time a directive runs, not when the extension is set up, so
+builds that never render a command do not pay for importing typer and rich.
+"""
+
+import builtins
+import contextvars
+import inspect
+import io
+import os
+import re
+import threading
+import time
+import traceback
+import types
+import typing as t
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from importlib.metadata import version as package_version
+from pathlib import Path
+
+from docutils import nodes
+from docutils.parsers import rst
+from rich.console import Console
+from rich.theme import Theme
+from sphinx.util import logging
+
+from sphinxcontrib.typer import (
+    DEFERRED_ATTRS,
+    THEME_DEFAULT_DARK_SELECTOR,
+    THEME_DEFAULT_LIGHT_SELECTOR,
+    ArtifactJob,
+    DiskCache,
+    ImportCache,
+    LazyTyperDirective,
+    RenderTarget,
+    RenderTheme,
+    __version__,
+    _get_attribute,
+    emit_event,
+    get_function,
+    record_timings,
+    store_payload,
+    typer_artifact,
+    typer_pending,
+)
+
+# As of typer 0.26 click is vendored into typer (typer._click). Typer commands
+# are instances of the vendored click classes, not the standalone click package
+# (which typer no longer depends on), so we use the vendored click throughout.
+from typer import __version__ as typer_version
+from typer import _click as click
+from typer import rich_utils as typer_rich_utils
+from typer.core import MarkupMode, TyperCommand, TyperGroup
+from typer.main import Typer
+from typer.main import get_command as build_typer_command
+from typer.models import Context as TyperContext
+from typer.models import TyperInfo
+
+
+def _filter_commands(ctx: click.Context, cmd_filter: t.List[str]):
+    return [ctx.command.get_command(ctx, cmd_name) for cmd_name in cmd_filter]
+
+
+def _add_dependency(directive: "TyperDirective", command):
+    cb = getattr(command, "callback", None)
+    cb = getattr(cb, "__wrapped__", cb)
+    if cb:
+        directive.note_dependency(inspect.getfile(cb))
+
+
+def _flatten(tree: t.Tuple[click.Context, t.Tuple]) -> t.List[click.Context]:
+    """
+    Flatten a tree of (context, children) tuples into its contexts, in preorder.
+    """
+    contexts = [tree[0]]
+    for child in tree[1]:
+        contexts.extend(_flatten(child))
+    return contexts
+
+
+def _command_path(ctx: t.Optional[click.Context]):
+    parts = []
+    while ctx:
+        parts.append(ctx.info_name)
+        ctx = ctx.parent
+    return ":".join(reversed(parts))
+
+
+def _stable(value: t.Any, depth: int = 3) -> t.Any:
+    """
+    Reduce an arbitrary object to a json serializable structure that is stable
+    between interpreter sessions (i.e. free of memory addresses).
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Enum):
+        return _stable(value.value, depth)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_stable(item, depth) for item in value]
+        return sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items
+    if isinstance(value, dict):
+        return {str(key): _stable(val, depth) for key, val in value.items()}
+    name = f"{type(value).__module__}.{type(value).__qualname__}"
+    if callable(value) and hasattr(value, "__qualname__"):
+        return f"{getattr(value, '__module__', '')}.{value.__qualname__}"
+    if depth and hasattr(value, "__dict__"):
+        state = vars(value)
+        # some objects keep all of their state private (e.g. rich's Palette)
+        public = {attr: val for attr, val in state.items() if not attr.startswith("_")}
+        return {
+            "__type__": name,
+            **{
+                attr: _stable(val, depth - 1)
+                for attr, val in sorted((public or state).items())
+            },
+        }
+    rep = repr(value)
+    return name if " at 0x" in rep else rep
+
+
+def _help_signature(command: click.Command, ctx: click.Context) -> t.Dict[str, t.Any]:
+    """
+    Build a structural signature of everything that contributes to the help
+    output of the given command: its attributes, parameters and the summaries of
+    any subcommands.
+
+    :param command: The command to build the signature for
+    :param ctx: The context the help will be rendered in
+    """
+    signature = {
+        "command_path": ctx.command_path,
+        **_stable(
+            {
+                attr: val
+                for attr, val in vars(command).items()
+                if attr not in {"params", "commands"} and not attr.startswith("_")
+            }
+        ),
+        "__type__": f"{type(command).__module__}.{type(command).__qualname__}",
+        "params": [_stable(param) for param in command.get_params(ctx)],
+    }
+    if isinstance(command, TyperGroup):
+        signature["commands"] = [
+            _stable(
+                {
+                    attr: getattr(cmd, attr, None)
+                    for attr in (
+                        "name",
+                        "help",
+                        "short_help",
+                        "hidden",
+                        "deprecated",
+                        "rich_help_panel",
+                    )
+                }
+            )
+            for cmd in _filter_commands(ctx, command.list_commands(ctx))
+            if cmd
+        ]
+    return signature
+
+
+def _rich_styles() -> t.Dict[str, t.Any]:
+    """
+    The module level style and layout settings of typer's rich_utils, these may
+    be altered by users and change the rendered help.
+    """
+    return _stable(
+        {
+            attr: val
+            for attr, val in vars(typer_rich_utils).items()
+            if attr.isupper() and not attr.startswith("_")
+        }
+    )
+
+
+_HEX_COLOR = re.compile(r"#[0-9a-fA-F]{6}\b")
+
+
+def merge_color_schemes(
+    light: str,
+    dark: str,
+    dark_selector: t.Optional[str] = None,
+    light_selector: t.Optional[str] = None,
+) -> t.Optional[str]:
+    """
+    Merge two exports of the same recording, made with different palettes, into
+    one export that switches between them. Every color that differs between the
+    exports is replaced with a CSS variable that holds the light color by default
+    and the dark color under ``prefers-color-scheme: dark`` or on elements that
+    match ``dark_selector``. Elements that match ``light_selector`` force the
+    light colors.
+
+    :param light: The html or svg exported with the light palette
+    :param dark: The same recording exported with the dark palette
+    :param dark_selector: A CSS selector of host page elements that switch to the
+        dark palette, or None
+    :param light_selector: A CSS selector of host page elements that switch to
+        the light palette, or None
+    :returns: The merged export, or None if the exports differ by more than their
+        colors (e.g. styles that rich merges in one palette but not the other)
+    """
+    parts = _HEX_COLOR.split(light)
+    if parts != _HEX_COLOR.split(dark):
+        return None
+    light_colors = _HEX_COLOR.findall(light)
+    dark_colors = _HEX_COLOR.findall(dark)
+    # variable names must be unique to the render, many may share a page
+    prefix = f"--typer-{DiskCache.key('scheme', light_colors, dark_colors)[:8]}"
+    variables: t.Dict[t.Tuple[str, str], str] = {}
+    merged = [parts[0]]
+    for light_color, dark_color, part in zip(light_colors, dark_colors, parts[1:]):
+        pair = (light_color.lower(), dark_color.lower())
+        if pair[0] == pair[1]:
+            merged.append(light_color)
+        else:
+            name = variables.setdefault(pair, f"{prefix}-{len(variables)}")
+            merged.append(f"var({name})")
+        merged.append(part)
+    if not variables:
+        return light
+    # svg presentation attributes do not resolve CSS variables, style properties do
+    markup = re.sub(r'\bfill="(var\([^)"]+\))"', r'style="fill: \1"', "".join(merged))
+
+    def block(selector: str, scheme: int) -> str:
+        values = " ".join(
+            f"{name}: {pair[scheme]};" for pair, name in variables.items()
+        )
+        return f"{selector} {{ {values} }}"
+
+    rules = [
+        block(":root", 0),
+        f"@media (prefers-color-scheme: dark) {{ {block(':root', 1)} }}",
+    ]
+    if dark_selector:
+        rules.append(block(dark_selector, 1))
+    if light_selector:
+        rules.append(block(light_selector, 0))
+    return markup.replace("</style>", "\n".join(rules) + "\n</style>", 1)
+
+
+_typer_commands: "weakref.WeakKeyDictionary[Typer, t.Tuple[t.Any, click.Command]]" = (
+    weakref.WeakKeyDictionary()
+)
+_typer_commands_lock = threading.Lock()
+
+
+def _typer_fingerprint(app: Typer) -> t.Any:
+    """
+    Identify the registrations of a Typer app (and its sub apps) so that apps that
+    are modified after their command tree was built are rebuilt.
+    """
+    return (
+        id(app.registered_callback),
+        id(app.info),
+        tuple(map(id, app.registered_commands)),
+        tuple(
+            (id(group), _typer_fingerprint(group.typer_instance))
+            for group in app.registered_groups
+            if group.typer_instance
+        ),
+    )
+
+
+def get_typer_command(app: Typer) -> click.Command:
+    """
+    Build the click command tree of a Typer app. Building the tree is expensive
+    and many directives may document the same app so trees are memoized for as
+    long as their app is alive.
+
+    :param app: The Typer app
+    :return: The root command of the app
+    """
+    try:
+        fingerprint = _typer_fingerprint(app)
+        with _typer_commands_lock:
+            cached = _typer_commands.get(app)
+    except (AttributeError, TypeError):
+        # not a real Typer (e.g. a proxy), or not weak referenceable
+        return build_typer_command(app)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    command = build_typer_command(app)
+    with _typer_commands_lock:
+        _typer_commands[app] = (fingerprint, command)
+    return command
+
+
+_rich_console_factory: "contextvars.ContextVar[t.Callable[..., Console]]" = (
+    contextvars.ContextVar("typer_rich_console_factory")
+)
+
+
+class _RichUtilsGlobals(dict):
+    """
+    The globals of our private copy of ``typer.rich_utils.rich_format_help``. Names
+    resolve to the live ``typer.rich_utils`` module globals, except for the console
+    getter which resolves to the factory of the render running in the current
+    thread (or task).
+    """
+
+    def __missing__(self, name: str) -> t.Any:
+        return vars(typer_rich_utils)[name]
+
+
+def _get_rich_console(stderr: bool = False) -> Console:
+    return _rich_console_factory.get()(stderr=stderr)
+
+
+_rich_format_help = types.FunctionType(
+    typer_rich_utils.rich_format_help.__code__,
+    _RichUtilsGlobals(_get_rich_console=_get_rich_console, __builtins__=vars(builtins)),
+    "rich_format_help",
+    typer_rich_utils.rich_format_help.__defaults__,
+)
+_rich_format_help.__kwdefaults__ = typer_rich_utils.rich_format_help.__kwdefaults__
+
+
+def typer_rich_format_help(
+    command: click.Command,
+    ctx: click.Context,
+    markup_mode: MarkupMode,
+    get_console: t.Callable[..., Console],
+) -> None:
+    """
+    Print the rich formatted help of a command to a console of our choosing.
+
+    Typer provides no official way to alter the console that prints the help,
+    so this calls a private copy of :func:`typer.rich_utils.rich_format_help`
+    whose console getter is chosen per call through a context variable. Unlike
+    patching :mod:`typer.rich_utils` no global state is modified, so help may
+    be rendered from many threads at once. The rich formatter is used for click
+    commands too, and regardless of the command's own ``rich_markup_mode``.
+
+    :param command: The command to print the help of
+    :param ctx: The command's context
+    :param markup_mode: The markup mode to render docstrings with
+    :param get_console: Called with the ``stderr`` flag to create the console to
+        print to
+    """
+    token = _rich_console_factory.set(get_console)
+    try:
+        _rich_format_help(obj=command, ctx=ctx, markup_mode=markup_mode)
+    finally:
+        _rich_console_factory.reset(token)
+
+
+Command = t.Union[TyperCommand, TyperGroup]
+
+"""
+Callbacks that return a dict of kwargs to pass to various renderer functions
+must all have the RenderCallback function signature:
+"""
+RenderCallback = t.Callable[
+    [
+        "TyperDirective",  # directive - the TyperDirective instance
+        str,  # name - the name of the command
+        Command,  # command - the command instance
+        click.Context,  # ctx - the click.Context instance
+        t.Optional[click.Context],  # parent - the parent click.Context instance
+    ],
+    t.Dict[str, t.Any],
+]
+
+"""
+Custom render options can be provided at a python path that resolves to the
+following type. Either a dictionary of kwargs to pass to the relevant function
+or a callable that returns a dictionary of kwargs to pass to the relevant function
+"""
+RenderOptions = t.Union[t.Dict[str, t.Any], RenderCallback]
+
+
+class TyperDirective(LazyTyperDirective):
+    """
+    A directive that renders a Typer app or Click command help text as either
+    an html, text literal or svg image node depending on the builder and
+    configuraton.
+
+    Ex usage.
+
+    .. code-block:: rst
+
+        .. typer:: import.path.to.typer.app:subcommand
+            :prog: script_name
+    """
+
+    logger = logging.getLogger("sphinxcontrib.typer")
+
+    # resolved options
+    prog_name: str
+    nested: bool
+    make_sections: bool
+    width: int
+    iframe_height: t.Optional[int] = None
+    typer_convert_png: bool = False
+    dependencies: str = "files"
+    # True if rendering is deferred until the document is written
+    deferred: bool = False
+
+    console: Console
+    parent: click.Context
+
+    theme: RenderTheme = RenderTheme.LIGHT
+    # if set, html and svg renders switch to this palette in dark color schemes
+    dark_theme: t.Optional[RenderTheme] = None
+    # the host page selectors that force the dark and light palettes
+    color_scheme_selectors: t.Tuple[t.Optional[str], t.Optional[str]] = (None, None)
+    preferred: t.Optional[RenderTarget] = None
+
+    markup_mode: MarkupMode
+
+    # the console_kwargs option can be a dict or a callable that returns a dict, the callable
+    # must conform to the RenderOptions signature
+    console_kwargs: RenderOptions
+    html_kwargs: RenderOptions
+    svg_kwargs: RenderOptions
+    text_kwargs: RenderOptions
+
+    target: RenderTarget
+
+    builder_targets = {
+        **{
+            builder: [RenderTarget.SVG, RenderTarget.HTML, RenderTarget.TEXT]
+            for builder in [
+                "html",
+                "dirhtml",
+                "singlehtml",
+                "htmlhelp",
+                "qthelp",
+                "devhelp",
+            ]
+        },
+        "epub": [RenderTarget.HTML, RenderTarget.SVG, RenderTarget.TEXT],
+        **{
+            builder: [RenderTarget.SVG, RenderTarget.TEXT]
+            for builder in ["latex", "latexpdf", "texinfo"]
+        },
+        **{builder: [RenderTarget.TEXT] for builder in ["text", "gettext"]},
+    }
+
+    @property
+    def builder(self) -> str:
+        return self.env.app.builder.name
+
+    @staticmethod
+    def uuid(normal_cmd: str, *content: t.Any) -> str:
+        """
+        Get a repeatable unique hash id for a command and the content it produces.
+
+        This is used to generate content addressed filenames for any build artifacts
+        like svg -> pdf conversions. Artifacts are named by what they contain, not
+        where the directive is, so moving a directive does not invalidate its
+        artifacts and identical renders on different pages share one file.
+
+        :param normal_cmd: The normalized command name
+        :param content: The rendered help and any conversion settings
+        """
+        return DiskCache.key("artifact", normal_cmd, *content)[:16]
+
+    def note_dependency(self, path: str) -> None:
+        """
+        Note a source file that the rendered help depends on. Files are not noted
+        if :confval:`typer_dependencies` is ``"help"``, documents are re-read when
+        the help signature of their commands changes instead.
+
+        :param path: The path to the source file
+        """
+        if self.dependencies == "files":
+            self.env.note_dependency(path)
+
+    def help_signature(self, contexts: t.Sequence[click.Context]) -> str:
+        """
+        Hash the structure of the help of the given commands - their parameters,
+        help strings and subcommands. See :confval:`typer_dependencies`.
+
+        :param contexts: The contexts of the commands the directive renders
+        """
+        return DiskCache.key(
+            "signature", [_help_signature(ctx.command, ctx) for ctx in contexts]
+        )
+
+    def import_object(
+        self,
+        obj_path: t.Optional[str],
+        accessor: t.Callable[[t.Any, str, t.Any], t.Any] = _get_attribute,
+    ) -> t.Any:
+        """
+        Imports an arbitrary object from a python string path.
+        Delimiters can be '.', '::' or ':'.
+
+        Resolutions are memoized for the duration of the build - including
+        failures, which are reported again without retrying the import.
+
+        :param obj_path: The python path to the object, if False, returns None
+        """
+        if not obj_path:
+            return None
+        imports = getattr(self.env.app, "typer_imports", None) or ImportCache()
+        if obj_path in imports.failed:
+            raise self.severe(imports.failed[obj_path])
+        if accessor is _get_attribute and obj_path in imports.objects:
+            obj, file_spec = imports.objects[obj_path]
+            if file_spec:
+                self.note_dependency(file_spec)
+            return obj
+
+        parts = re.split(r"::|[.:]", obj_path)
+        tries = 1
+        try:
+            while True:
+                # walk up the import path until we find something importable
+                # then walk down the path fetching all the attributes
+                # this allows import strings to reach into nested class
+                # attributes
+                try:
+                    tries += 1
+                    try_path = ".".join(parts[0 : -(tries - 1)])
+                    with imports.lock:
+                        obj, file_spec = imports.import_module(try_path)
+                    if file_spec:
+                        self.note_dependency(file_spec)
+                    for attr in parts[-(tries - 1) :]:
+                        obj = accessor(obj, attr, try_path)
+                    break
+                except (ImportError, ModuleNotFoundError):
+                    if tries >= len(parts):
+                        raise
+
+        except (Exception, SystemExit) as exc:
+            err_msg = f'Failed to import "{obj_path}"'
+            if isinstance(exc, SystemExit):
+                err_msg += "The module appeared to call sys.exit()."
+            else:
+                err_msg += "The following exception was raised:\n{}".format(
+                    traceback.format_exc()
+                )
+            imports.failed[obj_path] = err_msg
+            raise self.severe(err_msg)
+
+        if accessor is _get_attribute:
+            imports.objects[obj_path] = (obj, file_spec)
+        return obj
+
+    def load_root_command(self, typer_path: str) -> Command:
+        """
+        Load the module.
+
+        :param typer_path: The python path to the Typer app instance.
+        """
+
+        def resolve_root_command(obj):
+            if isinstance(obj, (TyperCommand, TyperGroup)):
+                return obj
+
+            # use lenient duck typing check incase obj is a proxy for a Typer instance
+            if isinstance(obj, Typer) or isinstance(
+                getattr(obj, "info", None), TyperInfo
+            ):
+                return get_typer_command(obj)
+
+            if callable(obj):
+                ret = obj()
+                if isinstance(ret, Typer) or isinstance(
+                    getattr(ret, "info", None), TyperInfo
+                ):
+                    return get_typer_command(ret)
+                if isinstance(ret, (TyperCommand, TyperGroup)):
+                    return ret
+
+            raise self.error(
+                f'"{typer_path}" of type {type(obj)} is not a Typer app or command.'
+            )
+
+        def access_command(obj, attr, imprt_path) -> Command:
+            attr_obj = None
+            try:
+                attr_obj = getattr(obj, attr)
+                return resolve_root_command(attr_obj)
+            except Exception:
+                try:
+                    self.parent = TyperContext(
+                        resolve_root_command(obj),
+                        # we can't trust the name attribute for the first
+                        # command - but it is probably the best bet for
+                        # subsequent commands - so if this is a nested
+                        # import pull out the name attribute if it exists
+                        # otherwise we use the last successful import path
+                        # part because it is probably the module with main
+                        info_name=(
+                            (
+                                getattr(obj, "name", "")
+                                if getattr(self, "parent", None)
+                                else ""
+                            )
+                            or imprt_path.split(".")[-1]
+                        ),
+                        parent=getattr(self, "parent", None),
+                    )
+                    cmds = _filter_commands(self.parent, [attr])
+                    if cmds:
+                        return cmds[0]
+                except (IndexError, rst.DirectiveError):
+                    if attr_obj:
+                        return attr_obj
+                raise
+
+        return resolve_root_command(
+            self.import_object(typer_path, accessor=access_command)
+        )
+
+    def get_html(self, console: Console, **options):
+        return self.export_themed(RenderTarget.HTML, console.export_html, **options)
+
+    def get_svg(self, console: Console, **options):
+        return self.export_themed(RenderTarget.SVG, console.export_svg, **options)
+
+    def color_scheme(
+        self, target: RenderTarget
+    ) -> t.Optional[t.Tuple[t.Optional[str], t.Optional[str]]]:
+        """
+        The dark and light selectors a render for the given target switches themes
+        with, or None if it is rendered with the light theme alone. Only renders
+        that are inlined into html pages can switch - converters such as cairosvg
+        do not resolve CSS variables. Html renders are embedded in iframes that
+        never match the selectors so they follow the media query alone.
+
+        :param target: The render target
+        """
+        if not self.dark_theme or self.typer_convert_png or "html" not in self.builder:
+            return None
+        if target is RenderTarget.HTML:
+            return (None, None)
+        if target is RenderTarget.SVG:
+            return self.color_scheme_selectors
+        return None
+
+    def export_themed(
+        self, target: RenderTarget, export: t.Callable[..., str], **options
+    ) -> str:
+        """
+        Export a recording with the directive's theme. If a ``dark-theme`` is set
+        and the render is inlined into html the recording is also exported with it
+        and the two are merged into one render that follows the color scheme of the
+        reader, see :func:`merge_color_schemes` and :meth:`color_scheme`. An
+        explicit theme in the export options disables the merge.
+
+        :param target: The render target
+        :param export: The console export method to call
+        :param options: The export options
+        """
+        rendered = export(
+            **{"theme": self.theme.terminal_theme, **options, "clear": False}
+        )
+        scheme = self.color_scheme(target)
+        if scheme is not None and "theme" not in options:
+            merged = merge_color_schemes(
+                rendered,
+                export(
+                    **{
+                        **options,
+                        "theme": self.dark_theme.terminal_theme,
+                        "clear": False,
+                    }
+                ),
+                *scheme,
+            )
+            if merged is None:
+                self.logger.warning(
+                    "Unable to merge the %s and %s themes of %s, using %s.",
+                    self.theme,
+                    self.dark_theme,
+                    self.arguments[0],
+                    self.theme,
+                )
+            return merged or rendered
+        return rendered
+
+    def get_text(self, console: Console, **options):
+        return console.export_text(**{**options, "clear": False})
+
+    def write_artifact(self, job: ArtifactJob, doc_dir: Path, alt: str) -> nodes.Node:
+        """
+        Write a build artifact (e.g. a pdf or png rendering) and return the image node
+        that displays it. If ``typer_max_workers`` is set the job is deferred to the
+        end of the read phase and a placeholder node is returned instead.
+
+        :param job: The artifact conversion job
+        :param doc_dir: The directory of the document the artifact is displayed in
+        :param alt: The image alt text
+        """
+        uri = os.path.relpath(job.path, doc_dir)
+        if not hasattr(self.env, "typer_artifacts"):
+            self.env.typer_artifacts = {}
+        self.env.typer_artifacts.setdefault(self.env.docname, set()).update(
+            Path(path).name for path in (job.path, job.svg_path) if path
+        )
+        if self.env.app.config.typer_max_workers == 0:
+            start = time.perf_counter()
+            written = job.run(self)
+            seconds = time.perf_counter() - start
+            job.written(self.env, written, seconds)
+            record_timings(self.env, job.command, {job.phase: seconds}, self.target)
+            return nodes.image(uri=uri, alt=alt)
+
+        if not hasattr(self.env, "typer_artifact_jobs"):
+            self.env.typer_artifact_jobs = {}
+        self.env.typer_artifact_jobs[job.path] = job._replace(
+            directive={
+                attr: getattr(self, attr)
+                for attr in DEFERRED_ATTRS
+                if hasattr(self, attr)
+            }
+        )
+        # register the image ourselves, the file will not exist until the
+        # job is run after the read phase
+        src_uri = self.env.relfn2path(uri, self.env.docname)[0]
+        self.env.images.add_file(self.env.docname, src_uri)
+        return typer_artifact(uri=src_uri, alt=alt)
+
+    def render_command(
+        self,
+        name: str,
+        command: click.Command,
+        parent: t.Optional[click.Context],
+    ) -> t.Optional["RenderedCommand"]:
+        """
+        Render the help for a Typer command or group, and for its subcommands if
+        nested.
+
+        The command tree is walked first, then the help of every command in it
+        is rendered - on a pool of :confval:`typer_render_workers` threads if
+        there is more than one - and the results are reassembled in the order
+        the tree was walked, so the output does not depend on the order renders
+        finish in.
+
+        :param name: The name of the command
+        :param command: Instance of a Typer command or group
+        :param parent: Instance of `typer.models.Context`, or None
+        :returns: The rendered command tree, or None if the command is hidden
+        """
+        tree = self.collect_commands(name, command, parent)
+        if tree is None:
+            return None
+
+        contexts = _flatten(tree)
+
+        def start(ctx: click.Context) -> None:
+            emit_event(
+                self.env,
+                "typer-render-start",
+                _command_path(ctx).replace(":", " "),
+                self.target,
+            )
+
+        def end(result: t.Tuple) -> t.Tuple:
+            normal_cmd, _, help_txt, cache_hit, timings = result
+            emit_event(
+                self.env,
+                "typer-render-end",
+                normal_cmd,
+                self.target,
+                size=len(help_txt.encode("utf-8")),
+                duration=sum(timings.values()),
+                cache_hit=cache_hit,
+            )
+            return result
+
+        workers = self.render_workers
+        results = []
+        if len(contexts) > 1 and (workers is None or workers > 1):
+            with ThreadPoolExecutor(workers) as executor:
+                futures = []
+                for ctx in contexts:
+                    start(ctx)
+                    futures.append(executor.submit(self.render_help, ctx))
+                results = [end(future.result()) for future in futures]
+        else:
+            for ctx in contexts:
+                start(ctx)
+                results.append(end(self.render_help(ctx)))
+
+        stats = [result[3] for result in results if result[3] is not None]
+        if stats:
+            if not hasattr(self.env, "typer_cache_stats"):
+                self.env.typer_cache_stats = {}
+            doc_stats = self.env.typer_cache_stats.setdefault(
+                self.env.docname, {"hits": 0, "misses": 0}
+            )
+            doc_stats["hits"] += sum(stats)
+            doc_stats["misses"] += len(stats) - sum(stats)
+
+        rendered = iter(results)
+
+        def assemble(node: t.Tuple[click.Context, t.Tuple]) -> RenderedCommand:
+            normal_cmd, section_title, help_txt, cache_hit, timings = next(rendered)
+            return RenderedCommand(
+                normal_cmd,
+                section_title,
+                help_txt,
+                tuple(assemble(child) for child in node[1]),
+                timings,
+                cache_hit,
+            )
+
+        command_tree = assemble(tree)
+        if self.dependencies == "help":
+            command_tree = command_tree._replace(
+                signature=self.help_signature(contexts)
+            )
+        return command_tree
+
+    def collect_commands(
+        self,
+        name: str,
+        command: click.Command,
+        parent: t.Optional[click.Context],
+    ) -> t.Optional[t.Tuple[click.Context, t.Tuple]]:
+        """
+        Walk the tree of commands to render, noting the source files of every
+        command as dependencies.
+
+        :param name: The name of the command
+        :param command: Instance of a Typer command or group
+        :param parent: Instance of `typer.models.Context`, or None
+        :returns: A tree of (context, children) tuples, or None if the command is
+            hidden
+        """
+        ctx = TyperContext(
+            command,
+            info_name=name,
+            parent=parent,
+            terminal_width=self.width,
+            max_content_width=self.width,
+        )
+
+        _add_dependency(self, command)
+
+        if command.hidden:
+            return None
+
+        # recurse through subcommands if we should
+        children = []
+        if isinstance(command, TyperGroup):
+            for subcommand in _filter_commands(ctx, command.list_commands(ctx)):
+                if self.nested:
+                    child = self.collect_commands(subcommand.name, subcommand, ctx)
+                    if child:
+                        children.append(child)
+                else:
+                    _add_dependency(self, subcommand)
+        return ctx, tuple(children)
+
+    def command_title(self, ctx: click.Context) -> t.Tuple[str, str]:
+        """
+        Get the normalized command path and the section title of a command.
+
+        :param ctx: The context of the command
+        """
+        normal_cmd = section_title = _command_path(ctx).replace(":", " ")
+        if not getattr(self, "parent", None):
+            section_title = section_title.split(" ")[-1]
+        return normal_cmd, section_title
+
+    def render_help(
+        self, ctx: click.Context
+    ) -> t.Tuple[str, str, str, t.Optional[bool], t.Dict[str, float]]:
+        """
+        Render the help for a single command to the directive's target. This may be
+        called from many threads at once so it must not modify the directive or the
+        environment.
+
+        :param ctx: The context of the command to render
+        :returns: A tuple of the command path, the section title, the rendered help,
+            whether the render cache was hit (None if there is no cache) and the
+            seconds spent in each phase of the render
+        """
+        normal_cmd, section_title, rendered, cache_hit, timings = self.render_targets(
+            ctx, [self.target]
+        )
+        return normal_cmd, section_title, rendered[self.target], cache_hit, timings
+
+    def render_targets(
+        self, ctx: click.Context, targets: t.Sequence[RenderTarget]
+    ) -> t.Tuple[
+        str, str, t.Dict[RenderTarget, str], t.Optional[bool], t.Dict[str, float]
+    ]:
+        """
+        Render the help for a single command to each of the given targets. The help
+        is recorded once and the recording exported to every target. This may be
+        called from many threads at once so it must not modify the directive or the
+        environment.
+
+        :param ctx: The context of the command to render
+        :param targets: The targets to render to
+        :returns: A tuple of the command path, the section title, the rendered help
+            by target, whether the render cache was hit for every target (None if
+            there is no cache) and the seconds spent in each phase of the render
+        """
+        command, name, parent = ctx.command, ctx.info_name, ctx.parent
+        normal_cmd, section_title = self.command_title(ctx)
+
+        # Summary
+        def resolve_options(
+            options: RenderOptions, parameter: str
+        ) -> t.Dict[str, t.Any]:
+            if callable(options):
+                options = options(self, name, command, ctx, parent)
+            if isinstance(options, dict):
+                return options
+            raise self.severe(
+                f"Invalid {parameter}, must be a dict or callable, got {type(options)}"
+            )
+
+        console_options = resolve_options(self.console_kwargs, "console-kwargs")
+        export_options: t.Dict[RenderTarget, t.Dict[str, t.Any]] = {}
+
+        def get_export_options(target: RenderTarget) -> t.Dict[str, t.Any]:
+            if target not in export_options:
+                export_options[target] = {
+                    **({"title": section_title} if target is RenderTarget.SVG else {}),
+                    **resolve_options(
+                        getattr(self, f"{target}_kwargs", {}), f"{target}-kwargs"
+                    ),
+                }
+            return export_options[target]
+
+        markup_mode = getattr(
+            self, "markup_mode", getattr(command, "rich_markup_mode", "markdown")
+        )
+
+        # consult the render cache, the key must capture everything that may alter
+        # the rendered output
+        cache = getattr(self.env.app, "typer_cache", None)
+        signature = _help_signature(command, ctx) if cache else None
+
+        def cache_key(target: RenderTarget) -> str:
+            return cache.key(
+                "render",
+                __version__,
+                typer_version,
+                package_version("rich"),
+                signature,
+                _rich_styles(),
+                self.width,
+                str(self.theme),
+                *(
+                    [str(self.dark_theme), scheme]
+                    if (scheme := self.color_scheme(target)) is not None
+                    else []
+                ),
+                markup_mode,
+                str(target),
+                _stable(console_options),
+                _stable(get_export_options(target)),
+            )
+
+        rendered: t.Dict[RenderTarget, str] = {}
+        cache_hit = None
+        shared: t.List[RenderTarget] = []
+        if cache:
+            for target in targets:
+                hit = cache.get(cache_key(target))
+                if hit is not None:
+                    rendered[target] = hit
+            cache_hit = len(rendered) == len(targets)
+            # with typer_render_all_targets the recording is exported to every
+            # target and cached, so other builders find their renders in the cache
+            if not cache_hit and self.env.app.config.typer_render_all_targets:
+                shared = [
+                    target
+                    for target in RenderTarget
+                    if target not in targets
+                    and not cache.path(cache_key(target)).is_file()
+                ]
+        missing = [target for target in targets if target not in rendered]
+        exports = missing + shared
+
+        consoles: t.List[Console] = []
+
+        def get_console(stderr: bool = False) -> Console:
+            consoles.append(
+                Console(
+                    **{
+                        "theme": Theme(
+                            {
+                                "option": typer_rich_utils.STYLE_OPTION,
+                                "switch": typer_rich_utils.STYLE_SWITCH,
+                                "negative_option": typer_rich_utils.STYLE_NEGATIVE_OPTION,
+                                "negative_switch": typer_rich_utils.STYLE_NEGATIVE_SWITCH,
+                                "types": typer_rich_utils.STYLE_TYPES,
+                                "types_sep": typer_rich_utils.STYLE_TYPES_SEPARATOR,
+                                "usage": typer_rich_utils.STYLE_USAGE,
+                            },
+                        ),
+                        "highlighter": typer_rich_utils.highlighter,
+                        "color_system": None
+                        if exports == [RenderTarget.TEXT]
+                        else typer_rich_utils.COLOR_SYSTEM,
+                        "force_terminal": typer_rich_utils.FORCE_TERMINAL,
+                        "width": self.width or typer_rich_utils.MAX_WIDTH,
+                        "stderr": stderr,
+                        "file": io.StringIO(),
+                        # overrides any defaults above
+                        **console_options,
+                        "record": True,
+                    }
+                )
+            )
+            return consoles[-1]
+
+        timings = {}
+        if missing:
+            start = time.perf_counter()
+            typer_rich_format_help(command, ctx, markup_mode, get_console)
+            timings["get_help"] = time.perf_counter() - start
+            for target in exports:
+                start = time.perf_counter()
+                exported = getattr(self, f"get_{target}")(
+                    consoles[-1], **get_export_options(target)
+                )
+                phase = "export" if target in missing else "export_shared"
+                timings[phase] = timings.get(phase, 0) + time.perf_counter() - start
+                if target in missing:
+                    rendered[target] = exported
+                if cache:
+                    cache.set(cache_key(target), exported)
+
+        return (
+            normal_cmd,
+            section_title,
+            {target: rendered[target] for target in targets},
+            cache_hit,
+            timings,
+        )
+
+    def raw_html(self, markup: str) -> nodes.Element:
+        """
+        Get the node for a block of rendered html. If :confval:`typer_payload_store`
+        is enabled the markup is stored outside of the doctree and a placeholder is
+        returned in its place.
+
+        :param markup: The html markup
+        """
+        if self.env.app.config.typer_payload_store and not self.deferred:
+            return store_payload(self.env, markup)
+        return nodes.raw("", markup, format="html")
+
+    def build_section(self, normal_cmd: str, section_title: str) -> nodes.Element:
+        """
+        Create the section (or container) node of a command and register it as a
+        :typer: reference target.
+
+        :param normal_cmd: The normalized command path
+        :param section_title: The title of the section
+        """
+        section_id = nodes.make_id(normal_cmd)
+
+        section = (
+            nodes.section(
+                "",
+                nodes.title(text=section_title),
+                ids=[section_id],
+                names=[nodes.fully_normalize_name(section_title)],
+            )
+            if self.make_sections
+            else nodes.container()
+        )
+        self.env.domaindata["std"].setdefault("typer", {})[section_id] = (
+            self.env.docname,
+            section_id,
+            normal_cmd,
+        )
+        return section
+
+    def build_content(self, command: "RenderedCommand") -> nodes.Node:
+        """
+        Create the node that displays the rendered help of a single command.
+
+        :param command: The rendered command
+        """
+        normal_cmd, section_title, rendered = (
+            command.name,
+            command.title,
+            command.rendered,
+        )
+
+        def to_path(name: str, ext: str, hook: t.Any) -> Path:
+            return artifact_path(
+                self.env.app.builder.outdir, name, ext, rendered, self.target, hook
+            )
+
+        # Image URIs must be relative to the document's directory, not srcdir,
+        # so that Sphinx can locate the file when the directive appears in a
+        # document nested inside a subdirectory (e.g. via autodoc).
+        # See https://github.com/sphinx-contrib/typer/issues/58
+        doc_dir = Path(self.env.srcdir) / Path(self.env.docname).parent
+
+        if self.typer_convert_png:
+            hook = self.env.app.config.typer_convert_png
+            return self.write_artifact(
+                ArtifactJob(
+                    hook,
+                    rendered,
+                    str(to_path(normal_cmd, "png", hook)),
+                    self.target,
+                    command=normal_cmd,
+                ),
+                doc_dir,
+                alt=section_title,
+            )
+        elif self.target == RenderTarget.HTML:
+            return self.raw_html(
+                get_function(self.env.app.config.typer_render_html)(
+                    self, normal_cmd, rendered
+                )
+            )
+        elif self.target == RenderTarget.SVG:
+            if "html" in self.builder:
+                return self.raw_html(rendered)
+            hook = self.env.app.config.typer_svg2pdf
+            return self.write_artifact(
+                ArtifactJob(
+                    hook,
+                    rendered,
+                    str(to_path(normal_cmd, "pdf", hook)),
+                    self.target,
+                    svg_path=str(to_path(normal_cmd, "svg", hook)),
+                    command=normal_cmd,
+                ),
+                doc_dir,
+                alt=section_title,
+            )
+        elif self.target == RenderTarget.TEXT:
+            return nodes.literal_block(rendered, rendered)
+        raise self.severe(f"Invalid typer render target: {self.target}")
+
+    def build_nodes(self, command: "RenderedCommand") -> t.List[nodes.section]:
+        """
+        Generate the relevant Sphinx nodes for a rendered command tree.
+
+        :param command: The rendered command and its subcommands
+        :returns: A list of nested docutil nodes
+        """
+        section = self.build_section(command.name, command.title)
+        section += self.build_content(command)
+        for subcommand in command.subcommands:
+            section.extend(self.build_nodes(subcommand))
+        return [section]
+
+    def build_pending(
+        self, tree: t.Tuple[click.Context, t.Tuple]
+    ) -> t.List[nodes.section]:
+        """
+        Generate the Sphinx nodes for a command tree whose help will be rendered
+        when the document is written. See :confval:`typer_defer_render`.
+
+        :param tree: The tree of (context, children) tuples to render
+        :returns: A list of nested docutil nodes
+        """
+        ctx, children = tree
+        normal_cmd, section_title = self.command_title(ctx)
+        section = self.build_section(normal_cmd, section_title)
+        pending = typer_pending(
+            command=normal_cmd,
+            arguments=list(self.arguments),
+            options=dict(self.options),
+        )
+        if self.target == RenderTarget.TEXT:
+            # picks up the document's highlight settings when it is read
+            pending += nodes.literal_block("", "")
+        section += pending
+        for child in children:
+            section.extend(self.build_pending(child))
+        return [section]
+
+    def generate_nodes(
+        self,
+        name: str,
+        command: click.Command,
+        parent: t.Optional[click.Context],
+    ) -> t.List[nodes.section]:
+        """
+        Generate the relevant Sphinx nodes.
+
+        Generate node help for a Typer command or group.
+
+        :param command: Instance of a Typer command or group
+        :param parent: Instance of `typer.models.Context`, or None
+        :returns: A list of nested docutil nodes
+        """
+        rendered = self.render_command(name, command, parent)
+        return self.build_nodes(rendered) if rendered else []
+
+    def configure(self) -> None:
+        """
+        Resolve the directive options that do not require the command to be
+        imported.
+        """
+        self.make_sections = "make-sections" in self.options
+        self.nested = "show-nested" in self.options
+        self.prog_name = self.options.get("prog", "")
+        if "markup-mode" in self.options:
+            self.markup_mode = self.options["markup-mode"]
+
+        self.width = self.options.get("width", 65)
+        self.render_workers = self.env.app.config.typer_render_workers
+        self.dependencies = self.env.app.config.typer_dependencies
+        self.iframe_height = self.options.get("iframe-height", None)
+
+        # if no builders supplied but convert-png is set,
+        # force png for all builders, otherwise require the builder
+        # to be in the list of typer_convert_png builders
+        self.typer_convert_png = "convert-png" in self.options
+        if self.typer_convert_png:
+            builders = self.options["convert-png"].strip()
+            self.typer_convert_png = self.builder in builders if builders else True
+
+        self.preferred = self.options.get("preferred", None)
+        self.theme = self.options.get("theme", self.theme)
+        self.dark_theme = self.options.get("dark-theme", None)
+        self.color_scheme_selectors = (
+            self.env.app.config.typer_dark_selector,
+            self.env.app.config.typer_light_selector,
+        )
+
+        builder_targets = {}
+        for builder_target in self.options.get("builders", "").split(":"):
+            if builder_target.strip():
+                builder, targets = builder_target.split("=")[0:2]
+                builder_targets[builder.strip()] = [
+                    RenderTarget(target.strip()) for target in targets.split(",")
+                ]
+
+        builder_targets = {**self.builder_targets, **builder_targets}
+
+        if self.typer_convert_png:
+            self.target = (
+                self.preferred
+                or (builder_targets.get(self.builder, []) or [RenderTarget.SVG])[0]
+            )
+        elif self.builder not in builder_targets:
+            self.target = self.preferred or RenderTarget.TEXT
+            self.logger.debug(
+                "Unable to resolve render target for builder: %s - using: %s",
+                self.builder,
+                self.target,
+            )
+        else:
+            supported = builder_targets[self.builder]
+            self.target = (
+                self.preferred if self.preferred in supported else supported[0]
+            )
+
+        # artifacts must be registered as images while the document is read
+        config = self.env.app.config
+        self.deferred = bool(
+            getattr(config, "typer_defer_render", False)
+            and not getattr(config, "typer_isolate", False)
+            and not self.typer_convert_png
+            and (self.target != RenderTarget.SVG or "html" in self.builder)
+        )
+
+    def render(self) -> t.Optional["RenderedCommand"]:
+        """
+        Import the command and render its help. This is the part of the directive
+        that runs in the render worker when :confval:`typer_isolate` is set.
+
+        :returns: The rendered command tree, or None if the command is hidden
+        """
+        start = time.perf_counter()
+        command, parent = self.load_command()
+        self.load_kwargs()
+        import_time = time.perf_counter() - start
+        rendered = self.render_command(self.prog_name, command, parent)
+        if rendered:
+            rendered.timings["import"] = import_time
+        return rendered
+
+    def load_kwargs(self) -> None:
+        """
+        Import the console and export options of the directive.
+        """
+        for trg in ["console", *list(RenderTarget)]:
+            setattr(
+                self,
+                f"{trg}_kwargs",
+                self.import_object(self.options.get(f"{trg}-kwargs", None)) or {},
+            )
+
+    def load_command(self) -> t.Tuple[Command, t.Optional[click.Context]]:
+        """
+        Import the command to render and resolve the program name.
+
+        :returns: The command and its parent context, if it is a subcommand
+        """
+        command = self.load_root_command(self.arguments[0])
+
+        if not self.prog_name:
+            try:
+                self.prog_name = (
+                    command.callback.__module__.split(".")[-1]
+                    if hasattr(command, "callback") and not hasattr(self, "parent")
+                    else re.split(r"::|[.:]", self.arguments[0])[-1]
+                )
+            except Exception as err:
+                raise self.severe(
+                    "Unable to determine program name, please specify using :prog:"
+                ) from err
+
+        self.prog_name = self.prog_name.strip()
+
+        parent = getattr(self, "parent", None)
+        if parent and self.options.get("prog", None):
+            # we unset this because we're not at the root command and this gets
+            # messed up for whatever reason
+            # https://github.com/sphinx-contrib/typer/issues/24
+            parent.info_name = ""
+        return command, parent
+
+    def run(self) -> t.Iterable[nodes.section]:
+        self.env = self.state.document.settings.env
+        self.configure()
+        if self.deferred:
+            return self.defer()
+        if self.env.app.config.typer_isolate:
+            rendered = render_isolated(self)
+        else:
+            rendered = self.render()
+        if self.dependencies == "help":
+            self.record_signature(
+                rendered.signature if rendered else self.help_signature([])
+            )
+        if not rendered:
+            return []
+
+        def record(command: RenderedCommand) -> None:
+            record_timings(self.env, command.name, command.timings, self.target)
+            for subcommand in command.subcommands:
+                record(subcommand)
+
+        record(rendered)
+        return self.build_nodes(rendered)
+
+    def record_signature(self, signature: str) -> None:
+        """
+        Record the help signature of the directive's commands so the document can
+        be checked for changes. See :confval:`typer_dependencies`.
+        """
+        if not hasattr(self.env, "typer_signatures"):
+            self.env.typer_signatures = {}
+        self.env.typer_signatures.setdefault(self.env.docname, []).append(
+            (list(self.arguments), dict(self.options), signature)
+        )
+
+    def defer(self) -> t.List[nodes.section]:
+        """
+        Import the command and walk its tree, but leave rendering the help until
+        the document is written. See :confval:`typer_defer_render`.
+        """
+        command, parent = self.load_command()
+        tree = self.collect_commands(self.prog_name, command, parent)
+        if self.dependencies == "help":
+            self.record_signature(self.help_signature(_flatten(tree) if tree else []))
+        return self.build_pending(tree) if tree else []
+
+
+class RenderedCommand(t.NamedTuple):
+    """
+    The rendered help of a command and its rendered subcommands.
+    """
+
+    name: str  # the full command path, space separated
+    title: str
+    rendered: str
+    subcommands: t.Tuple["RenderedCommand", ...] = ()
+    timings: t.Optional[t.Dict[str, float]] = None  # seconds spent, by phase
+    cache_hit: t.Optional[bool] = None
+    # the help signature of the whole tree, see typer_dependencies
+    signature: t.Optional[str] = None
+
+
+class IsolatedRender(t.NamedTuple):
+    """
+    A request to render a directive in the render worker process.
+    """
+
+    arguments: t.List[str]
+    options: t.Dict[str, t.Any]
+    docname: str
+    builder: str
+    cache: t.Optional[DiskCache]
+    # the values of the _ISOLATED_CONFIG settings
+    config: t.Dict[str, t.Any]
+
+
+# the configuration values read by directives rendering in the worker process
+_ISOLATED_CONFIG = (
+    "typer_render_workers",
+    "typer_dependencies",
+    "typer_render_all_targets",
+    "typer_dark_selector",
+    "typer_light_selector",
+)
+
+
+_isolated_imports = ImportCache()
+
+# the queue events are forwarded to the Sphinx process on, in the render worker
+_isolated_events: t.Any = None
+
+
+def _init_render_worker(events) -> None:
+    global _isolated_events
+    _isolated_events = events
+
+
+def _forward_event(event: str, payload) -> None:
+    """
+    Forward an event emitted in the render worker to the Sphinx process, see
+    :meth:`RenderWorker.render`.
+    """
+    if _isolated_events is not None:
+        _isolated_events.put((event, payload))
+
+
+def _isolated_directive(
+    request: IsolatedRender,
+    dependencies: t.List[str],
+    emit: t.Optional[t.Callable[[str, t.Any], None]] = None,
+) -> TyperDirective:
+    """
+    Configure a directive from a request in the render worker process.
+
+    :param request: The directive to configure
+    :param dependencies: The list the directive's dependency files are added to
+    :param emit: Called with the name and payload of the events the directive
+        emits, if any
+    """
+    from types import SimpleNamespace
+
+    directive = TyperDirective.__new__(TyperDirective)
+    directive.arguments = request.arguments
+    directive.options = request.options
+    directive.env = SimpleNamespace(
+        app=SimpleNamespace(
+            emit=emit,
+            builder=SimpleNamespace(name=request.builder),
+            config=SimpleNamespace(**request.config),
+            typer_cache=request.cache,
+            typer_imports=_isolated_imports,
+        ),
+        docname=request.docname,
+        note_dependency=dependencies.append,
+        typer_cache_stats={},
+    )
+    directive.configure()
+    return directive
+
+
+def _render_isolated(request: IsolatedRender) -> t.Tuple[t.Any, ...]:
+    """
+    Import and render a directive's command in the render worker process.
+
+    :returns: A tuple of the rendered command tree (or directive error level and
+        message), the dependency files and the render cache statistics.
+    """
+    dependencies: t.List[str] = []
+    try:
+        directive = _isolated_directive(request, dependencies, _forward_event)
+        rendered: t.Any = directive.render()
+    except rst.DirectiveError as err:
+        # directive errors can not be pickled
+        rendered = (err.level, err.msg)
+    finally:
+        # all of the events of the render have been forwarded
+        _forward_event("", None)
+    return (
+        rendered,
+        dependencies,
+        directive.env.typer_cache_stats.get(request.docname, {}),
+    )
+
+
+def _signature(directive: TyperDirective) -> str:
+    command, parent = directive.load_command()
+    tree = directive.collect_commands(directive.prog_name, command, parent)
+    return directive.help_signature(_flatten(tree) if tree else [])
+
+
+def _signature_isolated(request: IsolatedRender) -> t.Optional[str]:
+    """
+    Compute the help signature of a directive's commands in the render worker
+    process.
+    """
+    try:
+        return _signature(_isolated_directive(request, []))
+    except (Exception, SystemExit):
+        return None
+
+
+def command_signature(
+    app, docname: str, arguments: t.List[str], options: t.Dict[str, t.Any]
+) -> t.Optional[str]:
+    """
+    Import a directive's command and compute the help signature of the commands it
+    renders, without rendering them. Imports are shared with the directives of the
+    build. If :confval:`typer_isolate` is set the command is imported in the
+    render worker process instead.
+
+    :param app: The Sphinx application
+    :param docname: The document the directive is in
+    :param arguments: The arguments of the directive
+    :param options: The options of the directive
+    :returns: The help signature or None if the command could not be loaded
+    """
+    from concurrent.futures.process import BrokenProcessPool
+    from types import SimpleNamespace
+
+    if app.config.typer_isolate:
+        worker = getattr(app, "typer_render_worker", None)
+        if worker is None:
+            worker = app.typer_render_worker = RenderWorker()
+        try:
+            return worker.signature(
+                IsolatedRender(
+                    list(arguments),
+                    dict(options),
+                    docname,
+                    app.builder.name,
+                    getattr(app, "typer_cache", None),
+                    {name: getattr(app.config, name) for name in _ISOLATED_CONFIG},
+                )
+            )
+        except BrokenProcessPool:
+            return None
+
+    directive = TyperDirective.__new__(TyperDirective)
+    directive.arguments = arguments
+    directive.options = options
+    directive.env = SimpleNamespace(
+        app=app, docname=docname, note_dependency=lambda path: None
+    )
+    try:
+        directive.configure()
+        return _signature(directive)
+    except (Exception, SystemExit):
+        return None
+
+
+def _standalone_directive(
+    app_path: str,
+    targets: t.Sequence[RenderTarget],
+    width: int,
+    theme: t.Union[RenderTheme, str],
+    nested: bool,
+    prog: str,
+    options: t.Optional[t.Dict[str, t.Optional[str]]],
+    cache: t.Optional[DiskCache],
+    config: t.Any,
+    builder: str = "html",
+) -> TyperDirective:
+    """
+    Configure a directive that renders outside of a Sphinx build. See
+    :func:`render_commands` for the parameters.
+    """
+    from types import SimpleNamespace
+
+    unknown = set(options or {}) - set(LazyTyperDirective.option_spec)
+    if unknown:
+        raise ValueError(f"Unknown typer directive options: {', '.join(unknown)}")
+    directive = TyperDirective.__new__(TyperDirective)
+    directive.arguments = [app_path]
+    directive.options = {
+        name: LazyTyperDirective.option_spec[name](value)
+        for name, value in (options or {}).items()
+    }
+    directive.options.update(
+        width=width,
+        theme=RenderTheme(theme),
+        preferred=targets[0] if targets else RenderTarget.TEXT,
+        **({"prog": prog} if prog else {}),
+    )
+    if nested:
+        directive.options["show-nested"] = None
+    directive.env = SimpleNamespace(
+        app=SimpleNamespace(
+            builder=SimpleNamespace(name=builder),
+            config=config
+            or SimpleNamespace(
+                typer_render_workers=1,
+                typer_dependencies="files",
+                typer_render_all_targets=False,
+                typer_dark_selector=THEME_DEFAULT_DARK_SELECTOR,
+                typer_light_selector=THEME_DEFAULT_LIGHT_SELECTOR,
+            ),
+            typer_cache=cache,
+            typer_imports=ImportCache(),
+        ),
+        docname="",
+        note_dependency=lambda path: None,
+    )
+    directive.configure()
+    # render the requested targets whatever the builder supports
+    directive.target = directive.options["preferred"]
+    return directive
+
+
+def _standalone_contexts(directive: TyperDirective) -> t.List[click.Context]:
+    """
+    Import the command of a standalone directive and walk its tree.
+
+    :returns: The contexts of the commands to render, in preorder
+    """
+    command, parent = directive.load_command()
+    directive.load_kwargs()
+    tree = directive.collect_commands(directive.prog_name, command, parent)
+    return _flatten(tree) if tree else []
+
+
+def render_commands(
+    app_path: str,
+    targets: t.Iterable[t.Union[RenderTarget, str]] = (RenderTarget.TEXT,),
+    width: int = 65,
+    theme: t.Union[RenderTheme, str] = RenderTheme.LIGHT,
+    nested: bool = True,
+    prog: str = "",
+    options: t.Optional[t.Dict[str, t.Optional[str]]] = None,
+    cache: t.Optional[DiskCache] = None,
+    commands: t.Optional[t.Collection[str]] = None,
+    config: t.Any = None,
+    builder: str = "html",
+) -> t.Iterator[t.Tuple[str, RenderTarget, str]]:
+    """
+    Render the help of a Typer command, and of its subcommands if nested, without
+    a Sphinx build. Use this to pre-render help or to compare it in CI. The help
+    of each command is recorded once and exported to every target, exactly as the
+    ``typer`` directive renders it.
+
+    .. code-block:: python
+
+        from sphinxcontrib.typer import render_commands
+
+        for command, target, rendered in render_commands("mypkg.cli:app", ["text"]):
+            print(command, rendered)
+
+    :param app_path: The import path of the Typer app, as given to the directive
+    :param targets: The targets to render to
+    :param width: The width of the rendered help in characters
+    :param theme: The theme of html and svg renders
+    :param nested: Render the subcommands too
+    :param prog: The program name, inferred as the directive does if not given
+    :param options: Any other directive options, as they would be written in the
+        directive (e.g. ``{"markup-mode": "rich", "html-kwargs": "mypkg.kwargs"}``).
+        Flag options take None.
+    :param cache: A render cache to read renders from and store them in
+    :param commands: Render only the commands with these (space separated)
+        command paths, all commands by default
+    :param config: A Sphinx configuration to read the ``typer_*`` settings from,
+        the defaults are used if not given
+    :param builder: The name of the builder the help is rendered for. Html and
+        svg renders with a ``dark-theme`` only switch color schemes for html
+        builders.
+    :yields: (command path, target, rendered help) tuples, commands in preorder
+    :raises ValueError: If the command can not be imported or an option is invalid
+    """
+    targets = [RenderTarget(target) for target in targets]
+    directive = _standalone_directive(
+        app_path, targets, width, theme, nested, prog, options, cache, config, builder
+    )
+    try:
+        for ctx in _standalone_contexts(directive):
+            if commands is not None and directive.command_title(ctx)[0] not in commands:
+                continue
+            normal_cmd, _, rendered, _, _ = directive.render_targets(ctx, targets)
+            for target in targets:
+                yield normal_cmd, target, rendered[target]
+    except rst.DirectiveError as err:
+        raise ValueError(err.msg) from err
+
+
+def artifact_path(
+    outdir: t.Union[str, Path],
+    normal_cmd: str,
+    ext: str,
+    rendered: str,
+    target: RenderTarget,
+    hook: t.Any,
+) -> Path:
+    """
+    The content addressed path a build artifact of a command's rendered help is
+    written to.
+
+    :param outdir: The builder's output directory
+    :param normal_cmd: The normalized command path
+    :param ext: The file extension of the artifact
+    :param rendered: The rendered help the artifact is converted from
+    :param target: The render target of the help
+    :param hook: The conversion hook function or its import path
+    """
+    uuid = TyperDirective.uuid(normal_cmd, rendered, target, _stable(hook))
+    return (
+        Path(outdir) / f"{normal_cmd.replace(':', '_').replace(' ', '_')}_{uuid}.{ext}"
+    )
+
+
+class _DocumentEnv:
+    """
+    The build environment as seen by a directive that is rendered when its
+    document is written rather than when it is read.
+    """
+
+    def __init__(self, env, docname: str):
+        object.__setattr__(self, "_env", env)
+        object.__setattr__(self, "docname", docname)
+
+    def __getattr__(self, name: str) -> t.Any:
+        return getattr(self._env, name)
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        setattr(self._env, name, value)
+
+    def note_dependency(self, path: str) -> None:
+        pass
+
+
+def render_pending(app, docname: str, pending: t.List[nodes.Element]) -> None:
+    """
+    Render the help of the commands whose rendering was deferred until their
+    document is written, replacing their placeholder nodes. Each directive's
+    commands are rendered together. See :confval:`typer_defer_render`.
+
+    :param app: The Sphinx application
+    :param docname: The document being written
+    :param pending: The :class:`~sphinxcontrib.typer.typer_pending` nodes of the
+        document
+    """
+    from sphinxcontrib.typer import measure_iframe_heights
+
+    env = _DocumentEnv(app.env, docname)
+    by_directive: t.Dict[str, t.List[nodes.Element]] = {}
+    for node in pending:
+        key = DiskCache.key(node["arguments"], _stable(node["options"]))
+        by_directive.setdefault(key, []).append(node)
+
+    for directive_nodes in by_directive.values():
+        directive = TyperDirective.__new__(TyperDirective)
+        directive.arguments = directive_nodes[0]["arguments"]
+        directive.options = directive_nodes[0]["options"]
+        directive.env = env
+        try:
+            directive.configure()
+            rendered = directive.render()
+        except rst.DirectiveError as err:
+            TyperDirective.logger.warning(
+                err.msg, location=(docname, directive_nodes[0].line)
+            )
+            rendered = None
+
+        commands: t.Dict[str, RenderedCommand] = {}
+
+        def index(command: RenderedCommand) -> None:
+            commands[command.name] = command
+            record_timings(env, command.name, command.timings, directive.target)
+            for subcommand in command.subcommands:
+                index(subcommand)
+
+        if rendered:
+            index(rendered)
+        for node in directive_nodes:
+            command = commands.get(node["command"])
+            if not command:
+                node.replace_self([])
+                continue
+            content = directive.build_content(command)
+            for child in node.findall(nodes.literal_block):
+                for attr in ("language", "force"):
+                    if attr in child:
+                        content[attr] = child[attr]
+            node.replace_self(content)
+
+    if getattr(app.env, "typer_iframe_queue", None):
+        measure_iframe_heights(app, app.env)
+
+
+class RenderWorker:
+    """
+    A child process that imports and renders commands for the build. Commands are
+    imported once, in the worker, so their imports and any global state they
+    leave behind do not affect the Sphinx process. The process (and all of the
+    memory it holds) goes away when the build finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._executor: t.Optional[ProcessPoolExecutor] = None
+        self._events: t.Any = None
+        self._pid = os.getpid()
+
+    def render(
+        self,
+        request: IsolatedRender,
+        emit: t.Optional[t.Callable[[str, t.Any], None]] = None,
+    ) -> t.Tuple[t.Any, ...]:
+        """
+        Render a directive in the worker, starting it if it is not running. The
+        ``typer-*`` events of the render are passed to ``emit`` as they happen in
+        the worker, so they are emitted in the same order and at the same points
+        of the render as in the Sphinx process.
+
+        :param request: The directive to render
+        :param emit: Called with the name and payload of each event
+        :raises BrokenProcessPool: if the worker died
+        """
+        from concurrent.futures.process import BrokenProcessPool
+        from queue import Empty
+
+        with self._render_lock:
+            executor = self._start()
+            future = executor.submit(_render_isolated, request)
+            events = self._events
+            while True:
+                try:
+                    event, payload = events.get(timeout=0.05)
+                except Empty:
+                    if future.done() and isinstance(
+                        future.exception(), BrokenProcessPool
+                    ):
+                        break
+                    continue
+                if not event:
+                    break
+                if emit:
+                    emit(event, payload)
+            return self._result(executor, future)
+
+    def signature(self, request: IsolatedRender) -> t.Optional[str]:
+        """
+        Compute the help signature of a directive's commands in the worker, starting
+        it if it is not running. See :confval:`typer_dependencies`.
+
+        :param request: The directive to compute the signature of
+        :raises BrokenProcessPool: if the worker died
+        """
+        return self._submit(_signature_isolated, request)
+
+    def _submit(self, function: t.Callable[[IsolatedRender], t.Any], request) -> t.Any:
+        executor = self._start()
+        return self._result(executor, executor.submit(function, request))
+
+    def _start(self) -> ProcessPoolExecutor:
+        from multiprocessing import get_context
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked by a parallel read, the worker belongs to our parent
+                self._executor, self._events = None, None
+                self._pid = os.getpid()
+            if self._executor is None:
+                context = get_context("spawn")
+                self._events = context.Queue()
+                self._executor = ProcessPoolExecutor(
+                    1,
+                    mp_context=context,
+                    initializer=_init_render_worker,
+                    initargs=(self._events,),
+                )
+            return self._executor
+
+    def _result(self, executor: ProcessPoolExecutor, future) -> t.Any:
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+    def close(self) -> None:
+        """
+        Stop the worker process.
+        """
+        with self._lock:
+            if self._executor and self._pid == os.getpid():
+                self._executor.shutdown()
+                self._events.close()
+            self._executor, self._events = None, None
+
+
+def render_isolated(directive: TyperDirective) -> t.Optional[RenderedCommand]:
+    """
+    Render a directive in the build's render worker process. See
+    :confval:`typer_isolate`.
+
+    :param directive: The directive to render
+    :returns: The rendered command tree, or None if the command is hidden
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    env = directive.env
+    worker = getattr(env.app, "typer_render_worker", None)
+    if worker is None:
+        worker = env.app.typer_render_worker = RenderWorker()
+    try:
+        rendered, dependencies, stats = worker.render(
+            IsolatedRender(
+                list(directive.arguments),
+                dict(directive.options),
+                env.docname,
+                directive.builder,
+                getattr(env.app, "typer_cache", None),
+                {name: getattr(env.app.config, name) for name in _ISOLATED_CONFIG},
+            ),
+            env.app.emit,
+        )
+    except BrokenProcessPool as err:
+        raise directive.severe(
+            f'The typer render worker died while rendering "{directive.arguments[0]}".'
+        ) from err
+    for dependency in dependencies:
+        env.note_dependency(dependency)
+    if stats:
+        if not hasattr(env, "typer_cache_stats"):
+            env.typer_cache_stats = {}
+        doc_stats = env.typer_cache_stats.setdefault(
+            env.docname, {"hits": 0, "misses": 0}
+        )
+        for stat, count in stats.items():
+            doc_stats[stat] += count
+    if isinstance(rendered, tuple) and not isinstance(rendered, RenderedCommand):
+        raise directive.directive_error(*rendered)
+    return rendered
@@ -0,0 +1,270 @@
+"""
+Benchmark sphinx-build on synthetic Typer command line interfaces.
+
+Each benchmark generates a Sphinx project that documents a synthetic CLI (see
+synthetic.py) and times a clean ``sphinx-build`` of it for a render target, a
+number of commands and a number of parallel jobs. Selenium is replaced by the
+fake web driver of the test suite and pdf conversion by a stub that writes the
+svg (see tests/typer/callbacks.py) so the benchmarks run offline and without a
+browser or cairo. The png conversion still imports selenium, so the png target is
+skipped when it is not installed. The render cache is disabled unless
+``--cache`` is given.
+
+Results are compared with the stored baseline (baseline.json) and any benchmark
+that is slower than the baseline by more than the tolerance is reported as a
+regression. A build that fails is reported as an error::
+
+    python tests/benchmarks/bench.py
+    python tests/benchmarks/bench.py --targets text html --commands 10 100 --jobs 1
+    python tests/benchmarks/bench.py --save  # record a new baseline
+
+Baselines are machine specific, record one on the machine you compare on.
+Parallel builds are not recorded on single cpu machines, where they only measure
+the overhead of the worker processes.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+from importlib.metadata import version
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).parent
+CALLBACKS = BENCHMARKS.parent / "typer"
+BASELINE = BENCHMARKS / "baseline.json"
+
+# target -> (builder, directive options)
+TARGETS: t.Dict[str, t.Tuple[str, t.Dict[str, str]]] = {
+    "text": ("text", {"preferred": "text"}),
+    "html": ("html", {"preferred": "html"}),
+    "svg": ("html", {"preferred": "svg"}),
+    "png": ("latex", {"preferred": "html", "convert-png": "latex"}),
+    "latex": ("latex", {"preferred": "svg"}),
+}
+COMMANDS = [10, 100, 1000]
+JOBS = ["1", "4", "auto"]
+
+CONF = """\
+import sys
+
+sys.path[:0] = [{benchmarks!r}, {callbacks!r}, {srcdir!r}]
+
+project = "Typer Benchmark"
+extensions = ["sphinxcontrib.typer"]
+typer_get_web_driver = "callbacks.fake_web_driver"
+typer_svg2pdf = "callbacks.fake_artifact"
+typer_cache_dir = {cache_dir!r}
+"""
+
+CLI = """\
+from synthetic import make_app
+
+app = make_app(
+    commands={commands}, breadth={breadth}, options={options}, markup_mode={markup!r}
+)
+"""
+
+
+def write_project(
+    srcdir: Path,
+    target: str,
+    commands: int,
+    breadth: int,
+    options: int,
+    markup: str,
+    cache_dir: t.Union[str, bool],
+) -> None:
+    """
+    Write a Sphinx project documenting a synthetic CLI. Each top level subcommand
+    is documented, with all of its subcommands, on its own page so parallel builds
+    have documents to distribute.
+    """
+    from synthetic import make_app
+    from typer.main import get_command
+
+    srcdir.mkdir(parents=True)
+    (srcdir / "conf.py").write_text(
+        CONF.format(
+            benchmarks=str(BENCHMARKS),
+            callbacks=str(CALLBACKS),
+            srcdir=str(srcdir),
+            cache_dir=cache_dir,
+        )
+    )
+    (srcdir / "cli.py").write_text(
+        CLI.format(commands=commands, breadth=breadth, options=options, markup=markup)
+    )
+    options_rst = "".join(
+        f"    :{option}: {value}\n" for option, value in TARGETS[target][1].items()
+    )
+    names = list(
+        get_command(make_app(commands, breadth, options, markup)).commands  # type: ignore[attr-defined]
+    )
+    for name in names:
+        (srcdir / f"{name}.rst").write_text(
+            f".. typer:: cli.app:{name}\n"
+            f"    :prog: cli\n"
+            f"    :width: 80\n"
+            f"    :make-sections:\n"
+            f"    :show-nested:\n"
+            f"{options_rst}"
+        )
+    (srcdir / "index.rst").write_text(
+        "Typer Benchmark\n===============\n\n"
+        ".. toctree::\n\n" + "".join(f"   {name}\n" for name in names)
+    )
+
+
+def run(
+    target: str,
+    commands: int,
+    jobs: str,
+    breadth: int,
+    options: int,
+    markup: str,
+    cache: bool,
+    repeat: int,
+) -> t.Optional[float]:
+    """
+    Time a clean build, returning the fastest of ``repeat`` builds in seconds or
+    None if the build failed.
+    """
+    with tempfile.TemporaryDirectory(prefix="typer-bench-") as tmp:
+        srcdir = Path(tmp) / "src"
+        cache_dir = str(Path(tmp) / "cache") if cache else False
+        write_project(srcdir, target, commands, breadth, options, markup, cache_dir)
+        times = []
+        for _ in range(repeat):
+            shutil.rmtree(Path(tmp) / "build", ignore_errors=True)
+            start = time.perf_counter()
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "sphinx",
+                    "-b",
+                    TARGETS[target][0],
+                    "-j",
+                    jobs,
+                    "-q",
+                    "-E",
+                    "-d",
+                    str(Path(tmp) / "build" / "doctrees"),
+                    str(srcdir),
+                    str(Path(tmp) / "build" / TARGETS[target][0]),
+                ],
+                capture_output=True,
+                text=True,
+            )
+            times.append(round(time.perf_counter() - start, 3))
+            if result.returncode:
+                print(result.stderr[-2000:], file=sys.stderr)
+                return None
+        return min(times)
+
+
+def metadata() -> t.Dict[str, t.Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        **{pkg: version(pkg) for pkg in ["sphinx", "typer", "rich"]},
+    }
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--commands", nargs="+", type=int, default=COMMANDS)
+    parser.add_argument("--jobs", nargs="+", default=JOBS)
+    parser.add_argument("--breadth", type=int, default=10)
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--markup", choices=["markdown", "rich"], default="markdown")
+    parser.add_argument("--cache", action="store_true", help="enable the render cache")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="the fraction slower than the baseline that counts as a regression",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BENCHMARKS))
+    baseline = (
+        json.loads(args.baseline.read_text())["results"]
+        if args.baseline.is_file()
+        else {}
+    )
+    results: t.Dict[str, float] = {}
+    regressions = []
+    failures = []
+    for target in args.targets:
+        if target == "png" and importlib.util.find_spec("selenium") is None:
+            print(f"{target:<20}   SKIPPED (selenium is not installed)", flush=True)
+            continue
+        for commands in args.commands:
+            for jobs in args.jobs:
+                key = f"{target}/{commands}/j{jobs}"
+                seconds = run(
+                    target,
+                    commands,
+                    jobs,
+                    args.breadth,
+                    args.options,
+                    args.markup,
+                    args.cache,
+                    args.repeat,
+                )
+                if seconds is None:
+                    failures.append(key)
+                    print(f"{key:<20}   FAILED", flush=True)
+                    continue
+                results[key] = seconds
+                reference = baseline.get(key)
+                line = f"{key:<20} {seconds:8.2f}s"
+                if reference:
+                    ratio = seconds / reference
+                    line += f"  {ratio:5.2f}x baseline ({reference:.2f}s)"
+                    if ratio > 1 + args.tolerance:
+                        regressions.append(key)
+                        line += "  REGRESSION"
+                print(line, flush=True)
+
+    if args.save:
+        if (os.cpu_count() or 1) < 2:
+            print("a single cpu is available, parallel builds are not saved")
+            results = {
+                key: value for key, value in results.items() if key.endswith("/j1")
+            }
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "metadata": metadata(),
+                    "results": {**baseline, **results},
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+    if failures:
+        print(f"{len(failures)} failed builds: {', '.join(failures)}")
+    return 1 if regressions or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Generate synthetic Typer command line interfaces of arbitrary size for
+benchmarking.
+"""
+
+import inspect
+import typing as t
+from enum import Enum
+
+import typer
+from typer.models import ArgumentInfo, OptionInfo
+
+
+class Color(str, Enum):
+    RED = "red"
+    GREEN = "green"
+    BLUE = "blue"
+
+
+DOCSTRINGS = {
+    "markdown": (
+        "Run the **{name}** command.\n\n"
+        "This command does `{name}` things:\n\n"
+        "* it has a *bulleted* list\n"
+        "* and some [links](https://example.com/{name})\n"
+    ),
+    "rich": (
+        "Run the [bold]{name}[/bold] command.\n\n"
+        "This command does [green]{name}[/green] things with "
+        "[italic]rich[/italic] markup."
+    ),
+}
+
+PARAMETERS: t.List[t.Tuple[t.Type, t.Any]] = [
+    (str, "default"),
+    (int, 1),
+    (float, 0.5),
+    (bool, False),
+    (Color, Color.RED),
+    (t.Optional[t.List[str]], None),
+]
+
+
+def make_command(name: str, options: int, markup_mode: str) -> t.Callable[..., None]:
+    """
+    Make a command function with the given number of options and an argument.
+
+    :param name: The name of the command
+    :param options: The number of options the command takes
+    :param markup_mode: The markup used in the docstrings, markdown or rich
+    """
+    params = {
+        "target": (
+            str,
+            ArgumentInfo(default=..., help=f"The target to {name}."),
+        ),
+        **{
+            f"option_{idx}": (
+                PARAMETERS[idx % len(PARAMETERS)][0],
+                OptionInfo(
+                    default=PARAMETERS[idx % len(PARAMETERS)][1],
+                    help=f"Option {idx} of the {name} command.",
+                    rich_help_panel="Advanced" if idx % 3 == 2 else None,
+                ),
+            )
+            for idx in range(options)
+        },
+    }
+
+    def command(**kwargs):
+        pass
+
+    command.__name__ = name.replace("-", "_")
+    command.__doc__ = DOCSTRINGS[markup_mode].format(name=name)
+    command.__signature__ = inspect.Signature(
+        [
+            inspect.Parameter(
+                param,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=info,
+                annotation=annotation,
+            )
+            for param, (annotation, info) in params.items()
+        ]
+    )
+    return command
+
+
+def make_app(
+    commands: int = 10,
+    breadth: int = 10,
+    options: int = 4,
+    markup_mode: str = "markdown",
+) -> typer.Typer:
+    """
+    Make a Typer app with at least the given number of commands. Commands are
+    grouped into a tree where each group has up to ``breadth`` children - the depth
+    of the tree grows with the number of commands.
+
+    :param commands: The number of leaf commands
+    :param breadth: The maximum number of subcommands per group
+    :param options: The number of options each command takes
+    :param markup_mode: The markup used in the docstrings, markdown or rich
+    """
+    count = 0
+
+    def build(name: str, size: int, path: str) -> typer.Typer:
+        nonlocal count
+        app = typer.Typer(
+            name=name,
+            help=DOCSTRINGS[markup_mode].format(name=path),
+            rich_markup_mode=markup_mode,
+            add_completion=False,
+        )
+        if size <= breadth:
+            for idx in range(size):
+                app.command(f"cmd{idx}")(
+                    make_command(f"{path}-cmd{idx}", options, markup_mode)
+                )
+                count += 1
+            return app
+        per_group = -(-size // breadth)  # ceil
+        for idx in range(breadth):
+            group_size = min(per_group, size - idx * per_group)
+            if group_size <= 0:
+                break
+            app.add_typer(build(f"grp{idx}", group_size, f"{path}-grp{idx}"))
+        return app
+
+    app = build("cli", commands, "cli")
+    assert count == commands
+    return app
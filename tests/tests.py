@@ -16,6 +16,7 @@ from skimage.transform import resize
 from pypdf import PdfReader
 import numpy as np
 import json
+import importlib
 
 TYPER_VERISON = tuple(int(v) for v in typer_version.split("."))
 
@@ -518,3 +519,1440 @@ def test_enums():
         assert target.value == str(target)
     for theme in RenderTheme:
         assert theme.value == str(theme)
+
+
+def test_render_cache():
+    """
+    A fresh environment rebuild should pull every rendered help page out of the
+    on-disk render cache instead of rendering it again through rich.
+    """
+    from sphinxcontrib.typer import cache_stats
+
+    ex_dir = TYPER_EXAMPLES / "composite"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    def build():
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "text",
+            bld_dir / "doctrees",
+            buildername="text",
+            freshenv=True,
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return app, (bld_dir / "text" / "index.txt").read_text()
+
+    app, first = build()
+    lookups = sum(cache_stats(app.env).values())
+    assert cache_stats(app.env)["misses"] > 0
+    assert (bld_dir / "doctrees" / "typer_cache").is_dir()
+
+    app, second = build()
+    assert cache_stats(app.env) == {"hits": lookups, "misses": 0}
+    assert first == second
+
+    if bld_dir.exists():
+        shutil.rmtree(bld_dir)
+
+
+def test_render_cache_kwargs(tmp_path):
+    """
+    Export options holding objects without a stable repr (e.g. a rich
+    TerminalTheme) must produce the same render cache key in every session.
+    """
+    import sys
+    from sphinxcontrib.typer import DiskCache, render_commands
+
+    class CountingCache(DiskCache):
+        hits = misses = 0
+
+        def get(self, key):
+            value = super().get(key)
+            if value is None:
+                CountingCache.misses += 1
+            else:
+                CountingCache.hits += 1
+            return value
+
+    sys.path.insert(0, str(TYPER_EXAMPLES / "composite"))
+    sys.path.insert(0, str(TYPER_EXAMPLES))
+    try:
+
+        def render():
+            return list(
+                render_commands(
+                    "composite.cli.app",
+                    ["svg"],
+                    prog="composite",
+                    options={"svg-kwargs": "callbacks.red_sands_kwargs"},
+                    cache=CountingCache(tmp_path),
+                )
+            )
+
+        first = render()
+        assert "#842a26" in first[0][2]
+        assert CountingCache.hits == 0
+        misses = CountingCache.misses
+        entries = len(list(tmp_path.glob("*/*")))
+
+        assert render() == first
+        assert CountingCache.hits == misses
+        assert CountingCache.misses == misses
+        assert len(list(tmp_path.glob("*/*"))) == entries
+    finally:
+        sys.path.remove(str(TYPER_EXAMPLES))
+        sys.path.remove(str(TYPER_EXAMPLES / "composite"))
+
+
+def test_web_driver_pool():
+    """
+    The pool should start drivers lazily, hand out warm drivers (reset between
+    uses) and shut every driver down when closed.
+    """
+    from contextlib import contextmanager
+    from types import SimpleNamespace
+    from sphinxcontrib.typer import WebDriverPool
+
+    started = []
+
+    class FakeDriver:
+        def __init__(self):
+            self.pages = []
+            self.quit = False
+
+        def get(self, url):
+            self.pages.append(url)
+
+        def delete_all_cookies(self):
+            pass
+
+        def get_window_size(self):
+            return {"width": 800, "height": 600}
+
+    @contextmanager
+    def factory(directive):
+        driver = FakeDriver()
+        started.append(driver)
+        yield driver
+        driver.quit = True
+
+    pool = WebDriverPool(factory, size=2)
+    directive = SimpleNamespace()
+    assert not started
+
+    for page in range(3):
+        with pool.acquire(directive) as driver:
+            driver.get(f"page{page}")
+    assert len(started) == 1
+    assert started[0].pages == ["page0", "about:blank", "page1", "about:blank", "page2"]
+
+    with pool.acquire(directive) as first, pool.acquire(directive) as second:
+        assert first is not second
+    assert len(started) == 2
+
+    # a driver that raises is discarded rather than returned to the pool
+    with pytest.raises(RuntimeError):
+        with pool.acquire(directive):
+            raise RuntimeError()
+    assert sum(driver.quit for driver in started) == 1
+
+    pool.close()
+    assert all(driver.quit for driver in started)
+
+    # a driver that fails to start breaks the pool, startup is not retried
+    attempts = []
+
+    @contextmanager
+    def broken(directive):
+        attempts.append(directive)
+        raise RuntimeError("no browser")
+        yield
+
+    pool = WebDriverPool(broken)
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match="no browser"):
+            with pool.acquire(directive):
+                pass
+    assert len(attempts) == 1
+    assert isinstance(pool.failure, RuntimeError)
+
+
+def test_iframe_height_broken_driver():
+    """
+    If the web driver fails to start, it is not started again for the rest of the
+    build and every iframe height is estimated after a single warning.
+    """
+    import io
+    import sys
+
+    sys.path.append(str(TYPER_EXAMPLES))
+    from callbacks import broken_web_drivers
+
+    broken_web_drivers.clear()
+    ex_dir = TYPER_EXAMPLES / "heights"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    warnings_io = io.StringIO()
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "html",
+        bld_dir / "doctrees",
+        buildername="html",
+        warning=warnings_io,
+        confoverrides={
+            "typer_get_iframe_height": "sphinxcontrib.typer.typer_get_iframe_height",
+            "typer_get_web_driver": "callbacks.broken_web_driver",
+            "typer_cache_dir": False,
+        },
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    iframes = bs((bld_dir / "html" / "index.html").read_text(), "html.parser").find_all(
+        "iframe"
+    )
+    assert len(iframes) > 2
+    assert all(int(iframe.attrs["height"].rstrip("px")) > 100 for iframe in iframes)
+    assert len(broken_web_drivers) == 1
+    assert warnings_io.getvalue().count("Unable to measure the iframe height") == 1
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_iframe_height_batch():
+    """
+    In batch mode every html page that needs a height is measured in a single
+    browser page load and the measured heights are substituted into the iframes
+    when the doctrees are resolved.
+    """
+    import sys
+
+    sys.path.append(str(TYPER_EXAMPLES))
+    from callbacks import FakeWebDriver
+
+    FakeWebDriver.reset_counts()
+    ex_dir = TYPER_EXAMPLES / "heights"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "html",
+        bld_dir / "doctrees",
+        buildername="html",
+        confoverrides={
+            "typer_iframe_height_batch": True,
+            "typer_get_web_driver": "callbacks.fake_web_driver",
+        },
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+
+    assert FakeWebDriver.started == 1
+    assert FakeWebDriver.page_loads == 1
+    assert FakeWebDriver.scripts == 1
+
+    iframes = bs((bld_dir / "html" / "index.html").read_text(), "html.parser").find_all(
+        "iframe"
+    )
+    assert len(iframes) == 6
+    for iframe in iframes:
+        height = FakeWebDriver.height(iframe.attrs["srcdoc"]) + 40
+        assert iframe.attrs["height"] == f"{height}px"
+
+    if bld_dir.exists():
+        shutil.rmtree(bld_dir)
+
+
+def test_estimate_iframe_height():
+    """
+    The browserless iframe height estimate should not start a web driver and should
+    agree with selenium measurements of the test fixtures (when a browser is
+    available).
+    """
+    import sys
+    from contextlib import suppress
+
+    sys.path.append(str(TYPER_EXAMPLES))
+    from callbacks import FakeWebDriver
+    from sphinxcontrib.typer import DeferredDirective, typer_get_web_driver
+
+    FakeWebDriver.reset_counts()
+    ex_dir = TYPER_EXAMPLES / "heights"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "html",
+        bld_dir / "doctrees",
+        buildername="html",
+        confoverrides={
+            "typer_get_iframe_height": "sphinxcontrib.typer.typer_estimate_iframe_height",
+            "typer_get_web_driver": "callbacks.fake_web_driver",
+        },
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    assert FakeWebDriver.started == 0
+
+    iframes = bs((bld_dir / "html" / "index.html").read_text(), "html.parser").find_all(
+        "iframe"
+    )
+    assert len(iframes) == 6
+    estimates = [int(iframe.attrs["height"].rstrip("px")) for iframe in iframes]
+    assert all(estimate > 100 for estimate in estimates)
+
+    driver = None
+    with suppress(Exception):
+        driver_cm = typer_get_web_driver(DeferredDirective(None))
+        driver = driver_cm.__enter__()
+    if driver is None:
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        pytest.skip("Unable to start a web driver to compare measurements against.")
+
+    import base64
+
+    try:
+        for iframe, estimate in zip(iframes, estimates):
+            driver.get(
+                "data:text/html;base64,"
+                f"{base64.b64encode(iframe.attrs['srcdoc'].encode()).decode()}"
+            )
+            measured = (
+                driver.execute_script(
+                    "return document.documentElement.getBoundingClientRect().height"
+                )
+                + 40
+            )
+            assert abs(measured - estimate) <= 0.05 * measured
+    finally:
+        driver_cm.__exit__(None, None, None)
+        shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_parallel_build():
+    """
+    Command references and render cache statistics collected by parallel read
+    workers must be merged back into the main environment.
+    """
+    from sphinxcontrib.typer import cache_stats
+
+    ex_dir = TYPER_EXAMPLES / "composite"
+    bld_dir = ex_dir / "build"
+
+    def build(parallel):
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "html",
+            bld_dir / "doctrees",
+            buildername="html",
+            parallel=parallel,
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return app
+
+    serial = build(1)
+    parallel = build(4)
+    assert parallel.is_parallel_allowed("read")
+
+    commands = parallel.env.domaindata["std"]["typer"]
+    assert commands == serial.env.domaindata["std"]["typer"]
+    assert commands["cli-subgroup-echo"][0] == "echo"
+    assert commands["composite-subgroup-multiply"][0] == "index"
+    assert commands["python-m-cli-py-repeat"][0] == "repeat"
+
+    refs = bs((bld_dir / "html" / "refs.html").read_text(), "html.parser")
+    links = [
+        (link.text, link.attrs["href"])
+        for link in refs.find("section").find_all("a", class_="reference")
+    ]
+    assert links == [
+        ("cli subgroup echo", "echo.html#cli-subgroup-echo"),
+        ("composite subgroup multiply", "index.html#composite-subgroup-multiply"),
+        ("repeat", "repeat.html#python-m-cli-py-repeat"),
+    ]
+
+    # every render is counted exactly once
+    assert sum(cache_stats(parallel.env).values()) == 10
+    assert sum(cache_stats(serial.env).values()) == 10
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_iframe_height_cache(tmp_path):
+    """
+    Measured iframe heights are cached on disk by page content so a clean build
+    sharing the cache directory does not need to start a web driver again.
+    """
+    import sys
+
+    sys.path.append(str(TYPER_EXAMPLES))
+    from callbacks import FakeWebDriver
+
+    ex_dir = TYPER_EXAMPLES / "heights"
+    bld_dir = ex_dir / "build"
+
+    def build(**overrides):
+        FakeWebDriver.reset_counts()
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "html",
+            bld_dir / "doctrees",
+            buildername="html",
+            confoverrides={
+                "typer_get_iframe_height": "sphinxcontrib.typer.typer_get_iframe_height",
+                "typer_get_web_driver": "callbacks.fake_web_driver",
+                "typer_cache_dir": str(tmp_path),
+                **overrides,
+            },
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return [
+            iframe.attrs["height"]
+            for iframe in bs(
+                (bld_dir / "html" / "index.html").read_text(), "html.parser"
+            ).find_all("iframe")
+        ]
+
+    heights = build()
+    assert FakeWebDriver.started == 1
+    assert FakeWebDriver.scripts == 6
+
+    assert build() == heights
+    assert FakeWebDriver.started == 0
+
+    # the padding is part of the key
+    padded = build(typer_iframe_height_padding=50)
+    assert FakeWebDriver.scripts == 6
+    assert padded == [f"{int(height[:-2]) + 10}px" for height in heights]
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_iframe_height_purge(tmp_path):
+    """
+    Iframe heights that no document uses any more are dropped from the
+    environment on incremental builds.
+    """
+
+    def directive(width):
+        return (
+            f".. typer:: render.app\n"
+            f"    :prog: render\n"
+            f"    :preferred: html\n"
+            f"    :width: {width}\n\n"
+        )
+
+    (tmp_path / "conf.py").write_text(
+        "import sys\n"
+        f"sys.path[:0] = [{str(TYPER_EXAMPLES)!r}, {str(TYPER_EXAMPLES / 'render')!r}]\n"
+        'extensions = ["sphinxcontrib.typer"]\n'
+        'typer_get_iframe_height = "sphinxcontrib.typer.typer_get_iframe_height"\n'
+        'typer_get_web_driver = "callbacks.fake_web_driver"\n'
+        "typer_cache_dir = False\n"
+    )
+    (tmp_path / "index.rst").write_text(
+        "Index\n=====\n\n.. toctree::\n\n   other\n\n" + directive(65) + directive(80)
+    )
+    (tmp_path / "other.rst").write_text("Other\n=====\n\n" + directive(90))
+
+    def build():
+        app = Sphinx(
+            tmp_path, tmp_path, tmp_path / "html", tmp_path / "doctrees", "html"
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return app.env
+
+    assert len(build().iframe_heights) == 3
+
+    (tmp_path / "index.rst").write_text(
+        "Index\n=====\n\n.. toctree::\n\n   other\n\n" + directive(65)
+    )
+    env = build()
+    assert len(env.iframe_heights) == 2
+    assert set(env.typer_iframe_keys) == {"index", "other"}
+
+    (tmp_path / "other.rst").unlink()
+    env = build()
+    assert len(env.iframe_heights) == 1
+    assert set(env.typer_iframe_keys) == {"index"}
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_artifact_workers(executor):
+    """
+    With typer_max_workers set, artifact conversions are deferred to the end of
+    the read phase and run on a worker pool before the images are resolved.
+    """
+    import io
+
+    ex_dir = TYPER_EXAMPLES / "render"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    warnings_io = io.StringIO()
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "latex",
+        bld_dir / "doctrees",
+        buildername="latex",
+        warning=warnings_io,
+        confoverrides={
+            "typer_svg2pdf": "callbacks.fake_artifact",
+            "typer_convert_png": "callbacks.fake_artifact",
+            "typer_max_workers": 2,
+            "typer_artifact_executor": executor,
+        },
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    assert "image.not_readable" not in warnings_io.getvalue()
+    assert not app.env.typer_artifact_jobs
+
+    latex = next((bld_dir / "latex").glob("*.tex")).read_text()
+    for ext in ["pdf", "png"]:
+        artifacts = list((bld_dir / "latex").glob(f"*.{ext}"))
+        assert len(artifacts) == 1
+        assert artifacts[0].stem in latex
+        assert "Usage" in artifacts[0].read_text()
+    assert next((bld_dir / "latex").glob("*.svg")).is_file()
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize(
+    "max_workers,executor", [(0, "thread"), (2, "thread"), (2, "process")]
+)
+def test_artifact_hook_directive(max_workers, executor):
+    """
+    Conversion hooks see the same directive attributes whether they run in the
+    directive or are deferred to a thread or process worker.
+    """
+    import json
+
+    ex_dir = TYPER_EXAMPLES / "render"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "latex",
+        bld_dir / "doctrees",
+        buildername="latex",
+        confoverrides={
+            "typer_svg2pdf": "callbacks.directive_artifact",
+            "typer_convert_png": "callbacks.directive_artifact",
+            "typer_max_workers": max_workers,
+            "typer_artifact_executor": executor,
+        },
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+
+    seen = {
+        ext: json.loads(next((bld_dir / "latex").glob(f"*.{ext}")).read_text())
+        for ext in ["pdf", "png"]
+    }
+    for ext, target in [("pdf", "svg"), ("png", "html")]:
+        assert seen[ext]["target"] == target
+        assert seen[ext]["builder"] == "latex"
+        assert seen[ext]["arguments"]
+        assert "preferred" in seen[ext]["options"]
+        assert seen[ext]["prog_name"]
+        assert seen[ext]["width"]
+        assert seen[ext]["max_workers"] == max_workers
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize("max_workers", [0, 2])
+def test_artifact_not_written(max_workers):
+    """
+    A conversion hook that writes nothing is reported as a warning and does not
+    stop the build.
+    """
+    import io
+
+    ex_dir = TYPER_EXAMPLES / "render"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    warnings_io = io.StringIO()
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "latex",
+        bld_dir / "doctrees",
+        buildername="latex",
+        warning=warnings_io,
+        confoverrides={
+            "typer_svg2pdf": "callbacks.no_artifact",
+            "typer_convert_png": "callbacks.no_artifact",
+            "typer_max_workers": max_workers,
+        },
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    warnings = warnings_io.getvalue()
+    assert warnings.count("the conversion hook did not write") == 2
+    assert not list((bld_dir / "latex").glob("*.pdf"))
+    assert not list((bld_dir / "latex").glob("*.png"))
+    assert not list((bld_dir / "latex").glob("*.tmp*"))
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_artifact_names():
+    """
+    Artifacts are named by their content so an unchanged artifact is not converted
+    again on rebuild, even with a fresh environment.
+    """
+    import sys
+
+    sys.path.append(str(TYPER_EXAMPLES))
+    from callbacks import artifacts_written
+
+    ex_dir = TYPER_EXAMPLES / "render"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    def build(**overrides):
+        artifacts_written.clear()
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "latex",
+            bld_dir / "doctrees",
+            buildername="latex",
+            freshenv=True,
+            confoverrides={
+                "typer_svg2pdf": "callbacks.fake_artifact",
+                "typer_convert_png": "callbacks.fake_artifact",
+                **overrides,
+            },
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return sorted(path.name for path in (bld_dir / "latex").glob("*.*g"))
+
+    artifacts = build()
+    assert len(artifacts_written) == 2
+    assert len(artifacts) == 2  # the png and the svg source of the pdf
+    assert not list((bld_dir / "latex").glob("*.tmp*"))
+
+    assert build() == artifacts
+    assert not artifacts_written
+
+    # unreferenced artifacts the extension wrote are garbage collected, other
+    # files in the output directory are left alone whatever their names
+    png = next((bld_dir / "latex").glob("*.png"))
+    stale = [
+        *(bld_dir / "latex" / name for name in artifacts),
+        png.with_name(f"{png.stem}.123.456.tmp{png.suffix}"),
+    ]
+    stale[-1].write_text("interrupted")
+    kept = [
+        bld_dir / "latex" / "diagram_20240101.png",
+        bld_dir / "latex" / "render_0123abcd.png",
+    ]
+    for path in kept:
+        path.write_text("kept")
+    hooks = {
+        "typer_svg2pdf": "callbacks.other_fake_artifact",
+        "typer_convert_png": "callbacks.other_fake_artifact",
+    }
+    build(typer_gc_artifacts="dry-run", **hooks)
+    assert all(path.is_file() for path in stale)
+    build(typer_gc_artifacts=False, **hooks)
+    assert all(path.is_file() for path in stale)
+    others = set(build(**hooks)) - {path.name for path in kept}
+    assert len(others) == 2
+    assert not others & set(artifacts)
+    assert not any(path.exists() for path in stale)
+    assert all(path.is_file() for path in kept)
+
+    assert set(build()) == {*artifacts, *(path.name for path in kept)}
+    assert not any((bld_dir / "latex" / name).exists() for name in others)
+    assert all(path.is_file() for path in kept)
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_import_cache(monkeypatch):
+    """
+    Module imports, including those of modules that do not exist, are only
+    attempted once per build.
+    """
+    from sphinxcontrib import typer as sphinxcontrib_typer
+
+    imported = []
+
+    def import_module(path):
+        imported.append(path)
+        return importlib.import_module(path)
+
+    monkeypatch.setattr(sphinxcontrib_typer, "import_module", import_module)
+    imports = sphinxcontrib_typer.ImportCache()
+
+    for _ in range(2):
+        module, origin = imports.import_module("json")
+        assert module is json
+        assert origin == json.__file__
+        with pytest.raises(ModuleNotFoundError):
+            imports.import_module("json.not_a_module")
+
+    assert imported == ["json", "json.not_a_module"]
+
+
+def test_typer_command_cache():
+    """
+    The click command tree of a Typer app is built once and rebuilt only if the
+    app is modified.
+    """
+    import typer
+    from sphinxcontrib.typer import get_typer_command
+
+    app = typer.Typer()
+
+    @app.command()
+    def one():
+        pass
+
+    @app.command()
+    def two():
+        pass
+
+    command = get_typer_command(app)
+    assert get_typer_command(app) is command
+
+    @app.command()
+    def three():
+        pass
+
+    rebuilt = get_typer_command(app)
+    assert rebuilt is not command
+    assert list(rebuilt.commands) == ["one", "two", "three"]
+    assert get_typer_command(app) is rebuilt
+
+
+def test_isolated_render():
+    """
+    With typer_isolate set commands are imported and rendered in a worker process
+    and the output, and the render events, are the same as rendering them in the
+    Sphinx process.
+    """
+    import sys
+
+    ex_dir = TYPER_EXAMPLES / "composite"
+    bld_dir = ex_dir / "build"
+
+    def build(isolate):
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        for module in [mod for mod in sys.modules if mod.startswith("composite")]:
+            del sys.modules[module]
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "text",
+            bld_dir / "doctrees",
+            buildername="text",
+            confoverrides={
+                "typer_isolate": isolate,
+                "typer_cache_dir": False,
+                "typer_render_workers": 2,
+            },
+        )
+        events = []
+        for event in ["typer-render-start", "typer-render-end"]:
+            app.connect(
+                event,
+                lambda app, payload, event=event: events.append(
+                    (event, payload.command, payload.target, payload.docname)
+                ),
+            )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return (
+            app,
+            {path.name: path.read_text() for path in (bld_dir / "text").glob("*.txt")},
+            events,
+        )
+
+    app, isolated, isolated_events = build(True)
+    assert not any(mod.startswith("composite") for mod in sys.modules)
+    assert app.typer_render_worker._executor is None
+    assert any(str(dep).endswith("cli.py") for dep in app.env.dependencies["index"])
+    commands = app.env.domaindata["std"]["typer"]
+
+    app, in_process, events = build(False)
+    assert isolated == in_process
+    # starts are emitted as the worker begins each render, not after it returns
+    assert isolated_events == events
+    assert app.env.domaindata["std"]["typer"] == commands
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_threaded_render():
+    """
+    Help can be rendered from many threads at once without any of the renders
+    interfering with each other or with typer's own console.
+    """
+    import io
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    from rich.console import Console
+    from typer import rich_utils
+    from typer.models import Context as TyperContext
+
+    from sphinxcontrib.typer import get_typer_command, typer_rich_format_help
+
+    sys.path.append(str(TYPER_EXAMPLES / "composite"))
+    from composite.cli import app
+
+    root = get_typer_command(app)
+    commands = [root, *root.commands.values()]
+    getter = rich_utils._get_rich_console
+
+    def render(job):
+        command, width = job
+        consoles = []
+
+        def get_console(stderr=False):
+            consoles.append(Console(width=width, file=io.StringIO(), record=True))
+            return consoles[-1]
+
+        ctx = TyperContext(command, info_name=command.name)
+        typer_rich_format_help(command, ctx, "markdown", get_console)
+        return consoles[-1].export_text()
+
+    jobs = [(command, 40 + 5 * i) for i in range(8) for command in commands] * 4
+    expected = [render(job) for job in jobs]
+    with ThreadPoolExecutor(16) as executor:
+        assert list(executor.map(render, jobs)) == expected
+    assert len(set(expected)) == len(jobs) // 4
+
+    def broken_console(stderr=False):
+        raise RuntimeError("no console")
+
+    with pytest.raises(RuntimeError):
+        typer_rich_format_help(root, TyperContext(root), "markdown", broken_console)
+    assert rich_utils._get_rich_console is getter
+    assert render(jobs[0]) == expected[0]
+
+
+def test_concurrent_nested_render():
+    """
+    Rendering the subcommands of a nested directive on a thread pool produces the
+    same output, in the same order, as rendering them one after another.
+    """
+    ex_dir = TYPER_EXAMPLES / "composite"
+    bld_dir = ex_dir / "build"
+
+    def build(workers):
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "html",
+            bld_dir / "doctrees",
+            buildername="html",
+            confoverrides={"typer_render_workers": workers, "typer_cache_dir": False},
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return {
+            path.name: path.read_text() for path in (bld_dir / "html").glob("*.html")
+        }
+
+    serial = build(1)
+    assert build(8) == serial
+    assert build(None) == serial
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_benchmark_harness():
+    """
+    The benchmark harness generates, builds and times a synthetic CLI project.
+    """
+    import sys
+
+    sys.path.append(str(Path(__file__).parent / "benchmarks"))
+    import bench
+    from synthetic import make_app
+    from typer.main import get_command
+
+    command = get_command(make_app(25, breadth=5, options=6, markup_mode="rich"))
+    assert len(command.commands) == 5
+
+    seconds = bench.run("text", 10, "1", 10, 2, "markdown", False, 1)
+    assert seconds is not None and seconds > 0
+
+
+def test_profile(tmp_path):
+    """
+    With typer_profile set, the phases of every rendered command are timed and
+    reported, including under parallel builds.
+    """
+    ex_dir = TYPER_EXAMPLES / "composite"
+    bld_dir = ex_dir / "build"
+
+    def build(parallel):
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        report = tmp_path / f"profile{parallel}.json"
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "text",
+            bld_dir / "doctrees",
+            buildername="text",
+            parallel=parallel,
+            confoverrides={"typer_profile": str(report), "typer_cache_dir": False},
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return json.loads(report.read_text())
+
+    serial = build(1)
+    assert {"import", "get_help", "export"} <= set(serial["totals"])
+    assert sum(serial["targets"].values()) == len(serial["commands"]) == 10
+    assert [cmd["total"] for cmd in serial["commands"]] == sorted(
+        (cmd["total"] for cmd in serial["commands"]), reverse=True
+    )
+
+    parallel = build(4)
+    key = lambda cmd: (cmd["docname"], cmd["command"])  # noqa: E731
+    assert sorted(map(key, parallel["commands"])) == sorted(
+        map(key, serial["commands"])
+    )
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_events(workers):
+    """
+    Renders and artifact writes are reported through the typer-* Sphinx events.
+    """
+    ex_dir = TYPER_EXAMPLES / "render"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "latex",
+        bld_dir / "doctrees",
+        buildername="latex",
+        confoverrides={
+            "typer_svg2pdf": "callbacks.fake_artifact",
+            "typer_convert_png": "callbacks.driver_artifact",
+            "typer_get_web_driver": "callbacks.fake_web_driver",
+            "typer_max_workers": workers,
+            "typer_cache_dir": False,
+        },
+    )
+    events = []
+    for event in [
+        "typer-render-start",
+        "typer-render-end",
+        "typer-artifact-written",
+        "typer-webdriver-acquired",
+    ]:
+        app.connect(
+            event, lambda app, payload, event=event: events.append((event, payload))
+        )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+
+    starts = [payload for event, payload in events if event == "typer-render-start"]
+    ends = [payload for event, payload in events if event == "typer-render-end"]
+    assert starts and [p.command for p in starts] == [p.command for p in ends]
+    for payload in ends:
+        assert payload.docname == "index"
+        assert payload.size > 0
+        assert payload.duration >= 0
+        assert payload.cache_hit is None  # the render cache is disabled
+
+    written = [
+        payload for event, payload in events if event == "typer-artifact-written"
+    ]
+    assert sorted(Path(p.path).suffix for p in written) == [".pdf", ".png"]
+    for payload in written:
+        assert payload.size == Path(payload.path).stat().st_size
+        assert payload.cache_hit is False
+        assert payload.command in {p.command for p in ends}
+
+    # the png conversion acquires a web driver for the command it converts
+    drivers = [
+        payload for event, payload in events if event == "typer-webdriver-acquired"
+    ]
+    png = next(p for p in written if p.path.endswith(".png"))
+    assert [p.command for p in drivers] == [png.command]
+    assert drivers[0].target == png.target
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_lazy_import(tmp_path):
+    """
+    Setting up the extension, and building a project that never renders a
+    command, must not import typer or rich.
+    """
+    import subprocess
+    import sys
+
+    (tmp_path / "conf.py").write_text('extensions = ["sphinxcontrib.typer"]\n')
+    (tmp_path / "index.rst").write_text("Title\n=====\n\nNo commands here.\n")
+    script = f"""
+import sys
+from sphinx.application import Sphinx
+
+app = Sphinx(
+    {str(tmp_path)!r},
+    {str(tmp_path)!r},
+    {str(tmp_path / "build")!r},
+    {str(tmp_path / "doctrees")!r},
+    buildername="dummy",
+    status=None,
+)
+app.build()
+assert not app.statuscode
+loaded = sorted(
+    mod for mod in sys.modules if mod.split(".")[0] in {{"typer", "rich", "click"}}
+)
+assert not loaded, loaded
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_payload_store():
+    """
+    With typer_payload_store enabled rendered html is kept out of the doctree and
+    substituted back when the doctree is resolved, producing the same page.
+    """
+    ex_dir = TYPER_EXAMPLES / "render"
+    bld_dir = ex_dir / "build"
+
+    def build(store):
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "html",
+            bld_dir / "doctrees",
+            buildername="html",
+            confoverrides={"typer_payload_store": store},
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return (
+            app,
+            (bld_dir / "html" / "index.html").read_text(),
+            (bld_dir / "doctrees" / "index.doctree").stat().st_size,
+        )
+
+    _, html, doctree_size = build(False)
+    app, stored_html, stored_doctree_size = build(True)
+
+    assert stored_html == html
+    assert stored_doctree_size < doctree_size / 2
+    store = Path(app.doctreedir) / "typer_payloads"
+    assert {path.name for path in store.iterdir()} == app.env.typer_payloads["index"]
+    assert len(app.env.typer_payloads["index"]) == 2  # html and svg
+
+    # a payload no document references is removed when the build finishes
+    (store / "stale").write_text("")
+    app.build()
+    assert not (store / "stale").exists()
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_help_dependencies():
+    """
+    With typer_dependencies = "help" documents are re-read when the help of their
+    commands changes, not when the source files of the commands are touched.
+    """
+    import sys
+    from sphinxcontrib.typer import get_typer_command
+
+    ex_dir = TYPER_EXAMPLES / "composite"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "text",
+        bld_dir / "doctrees",
+        buildername="text",
+        confoverrides={"typer_dependencies": "help", "typer_cache_dir": False},
+    )
+    read = []
+    app.connect(
+        "env-before-read-docs", lambda app, env, docnames: read.append(set(docnames))
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    assert "echo" in read[-1]
+    assert not any(app.env.dependencies.values())
+
+    cli = sys.modules["composite.cli"]
+    os.utime(cli.__file__)
+    app.build()
+    assert read[-1] == set()
+
+    echo = get_typer_command(cli.app).commands["subgroup"].commands["echo"]
+    help_txt = echo.help
+    echo.help = "A changed help string."
+    try:
+        app.build()
+    finally:
+        echo.help = help_txt
+    # the documents that render echo - directly or nested - are re-read
+    assert read[-1] == {"echo", "index", "subgroup"}
+
+    # with typer_isolate the signatures are computed in the render worker
+    shutil.rmtree(bld_dir, ignore_errors=True)
+    for module in [mod for mod in sys.modules if mod.startswith("composite")]:
+        del sys.modules[module]
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "text",
+        bld_dir / "doctrees",
+        buildername="text",
+        confoverrides={
+            "typer_dependencies": "help",
+            "typer_isolate": True,
+            "typer_cache_dir": False,
+        },
+    )
+    app.connect(
+        "env-before-read-docs", lambda app, env, docnames: read.append(set(docnames))
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    os.utime(cli.__file__)
+    app.build()
+    assert read[-1] == set()
+    assert not any(mod.startswith("composite") for mod in sys.modules)
+
+    group = Path(cli.__file__).parent / "group.py"
+    source = group.read_text()
+    group.write_text(source.replace("Echo the string.", "A changed help string."))
+    try:
+        app.build()
+    finally:
+        group.write_text(source)
+    assert read[-1] == {"echo", "index", "subgroup"}
+    assert not any(mod.startswith("composite") for mod in sys.modules)
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize("example,builder", [("render", "html"), ("composite", "text")])
+def test_defer_render(example, builder):
+    """
+    With typer_defer_render enabled only placeholders are stored in the doctree and
+    help is rendered when documents are written, producing the same output.
+    """
+    import pickle
+    from sphinxcontrib.typer import typer_pending
+
+    ex_dir = TYPER_EXAMPLES / example
+    bld_dir = ex_dir / "build"
+
+    def build(defer):
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / builder,
+            bld_dir / "doctrees",
+            buildername=builder,
+            confoverrides={"typer_defer_render": defer, "typer_cache_dir": False},
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        pending = sum(
+            len(list(pickle.loads(doctree.read_bytes()).findall(typer_pending)))
+            for doctree in (bld_dir / "doctrees").glob("*.doctree")
+        )
+        suffix = {"html": "html", "text": "txt"}[builder]
+        output = {
+            path.name: path.read_text()
+            for path in (bld_dir / builder).glob(f"*.{suffix}")
+        }
+        return output, pending
+
+    output, pending = build(False)
+    assert output and not pending
+    deferred_output, pending = build(True)
+    assert pending
+    assert deferred_output == output
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_render_all_targets(tmp_path):
+    """
+    With typer_render_all_targets enabled one recording is exported to every
+    target, so a second builder sharing the cache renders nothing.
+    """
+    from sphinxcontrib.typer import cache_stats
+
+    ex_dir = TYPER_EXAMPLES / "render"
+    bld_dir = ex_dir / "build"
+
+    def build(builder, cache_dir, all_targets=True):
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / builder,
+            bld_dir / "doctrees",
+            buildername=builder,
+            confoverrides={
+                "typer_cache_dir": cache_dir,
+                "typer_render_all_targets": all_targets,
+            },
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        suffix = {"html": "html", "text": "txt"}[builder]
+        return (
+            cache_stats(app.env),
+            (bld_dir / builder / f"index.{suffix}").read_text(),
+        )
+
+    _, html = build("html", False, all_targets=False)
+    _, text = build("text", False, all_targets=False)
+
+    # the three directives render the same text so only the first is a miss
+    stats, shared_text = build("text", str(tmp_path))
+    assert stats == {"hits": 2, "misses": 1}
+    assert shared_text == text
+
+    stats, shared_html = build("html", str(tmp_path))
+    assert stats == {"hits": 3, "misses": 0}
+    assert shared_html == html
+
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+
+def test_dark_theme(tmp_path):
+    """
+    A dark-theme renders html and svg once with CSS variables that switch between
+    the two palettes.
+    """
+    from rich.terminal_theme import MONOKAI
+
+    (tmp_path / "conf.py").write_text(
+        "import sys\n"
+        f"sys.path[:0] = [{str(TYPER_EXAMPLES)!r}, {str(TYPER_EXAMPLES / 'render')!r}]\n"
+        'extensions = ["sphinxcontrib.typer"]\n'
+        "typer_cache_dir = False\n"
+    )
+    (tmp_path / "index.rst").write_text(
+        "Render\n======\n\n"
+        + "".join(
+            f".. typer:: render.app\n"
+            f"    :prog: render\n"
+            f"    :preferred: {target}\n"
+            f"    :iframe-height: 300\n"
+            f"    :dark-theme: monokai\n\n"
+            for target in ["html", "svg"]
+        )
+    )
+    app = Sphinx(
+        tmp_path,
+        tmp_path,
+        tmp_path / "build",
+        tmp_path / "doctrees",
+        buildername="html",
+        confoverrides={"typer_light_selector": None},
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    index = (tmp_path / "build" / "index.html").read_text()
+
+    background = MONOKAI.background_color.hex
+    # the html render is escaped into the iframe srcdoc, where the host page
+    # selectors can never match, the svg is inline
+    assert index.count("@media (prefers-color-scheme: dark)") == 2
+    assert '[data-theme="dark"] {' in index
+    assert "data-theme=&quot;" not in index
+    assert 'style="fill: var(--typer-' in index
+    # under the media query of both renders and the dark selector of the svg
+    assert index.count(f": {background};") == 3
+
+    # renders converted to pdf or png are not merged, converters do not resolve
+    # CSS variables
+    app = Sphinx(
+        tmp_path,
+        tmp_path,
+        tmp_path / "latex",
+        tmp_path / "doctrees",
+        buildername="latex",
+        freshenv=True,
+        confoverrides={
+            "typer_svg2pdf": "callbacks.fake_artifact",
+            "typer_convert_png": "callbacks.fake_artifact",
+        },
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    artifacts = list((tmp_path / "latex").glob("*_*.*"))
+    assert {path.suffix for path in artifacts} == {".pdf", ".svg"}
+    for path in artifacts:
+        assert "var(--typer-" not in path.read_text()
+        assert "prefers-color-scheme" not in path.read_text()
+
+
+def test_render_commands():
+    """
+    render_commands renders the help of a command tree outside of Sphinx exactly
+    as the directive renders it.
+    """
+    import sys
+    from docutils import nodes
+    from sphinxcontrib.typer import RenderTarget, render_commands
+
+    ex_dir = TYPER_EXAMPLES / "composite"
+    bld_dir = ex_dir / "build"
+    shutil.rmtree(bld_dir, ignore_errors=True)
+    app = Sphinx(
+        ex_dir,
+        TYPER_EXAMPLES,
+        bld_dir / "text",
+        bld_dir / "doctrees",
+        buildername="text",
+        confoverrides={"typer_cache_dir": False},
+    )
+    app.build()
+    assert not app.statuscode, "Sphinx build failed"
+    directive_help = [
+        block.astext()
+        for block in app.env.get_doctree("index").findall(nodes.literal_block)
+    ]
+    shutil.rmtree(bld_dir, ignore_errors=True)
+
+    sys.path.insert(0, str(ex_dir))
+    try:
+        rendered = list(
+            render_commands(
+                "composite.cli.app", ["text", "html", "svg"], prog="composite"
+            )
+        )
+        commands = [command for command, target, _ in rendered if target == "text"]
+        assert commands[0] == "composite"
+        assert "composite repeat" in commands
+        assert len(rendered) == 3 * len(commands)
+        assert [
+            help for _, target, help in rendered if target is RenderTarget.TEXT
+        ] == directive_help
+        html = [help for _, target, help in rendered if target is RenderTarget.HTML]
+        assert all(page.startswith("<!DOCTYPE html>") for page in html)
+        svg = [help for _, target, help in rendered if target is RenderTarget.SVG]
+        assert all(image.startswith("<svg") for image in svg)
+
+        assert [
+            command
+            for command, _, _ in render_commands(
+                "composite.cli.app", nested=False, prog="composite"
+            )
+        ] == ["composite"]
+        with pytest.raises(ValueError):
+            list(render_commands("composite.cli.missing"))
+        with pytest.raises(ValueError):
+            list(render_commands("composite.cli.app", options={"bogus": None}))
+    finally:
+        sys.path.remove(str(ex_dir))
+
+
+def test_prerender(tmp_path):
+    """
+    The prerender command fills the render cache on worker processes so the build
+    that follows only has cache hits, and writes a manifest the build checks.
+    """
+    import sys
+    from sphinxcontrib.typer import check_prerender_manifest
+    from sphinxcontrib.typer.prerender import main
+
+    ex_dir = TYPER_EXAMPLES / "composite"
+    bld_dir = ex_dir / "build"
+    cache_dir = tmp_path / "cache"
+    sys.path.insert(0, str(ex_dir))
+    try:
+        assert not main(
+            [
+                "prerender",
+                "composite.cli.app",
+                "--prog",
+                "composite",
+                "--show-nested",
+                "--targets",
+                "text",
+                "--option",
+                "make-sections",
+                "--cache-dir",
+                str(cache_dir),
+                "--jobs",
+                "2",
+            ]
+        )
+    finally:
+        sys.path.remove(str(ex_dir))
+    manifest = json.loads((cache_dir / "prerender.json").read_text())
+    (run,) = manifest["runs"]
+    assert [command for command, _ in run["commands"]][0] == "composite"
+    assert len(run["commands"]) == len(run["cache"]) == 5
+
+    def build():
+        shutil.rmtree(bld_dir, ignore_errors=True)
+        app = Sphinx(
+            ex_dir,
+            TYPER_EXAMPLES,
+            bld_dir / "text",
+            bld_dir / "doctrees",
+            buildername="text",
+            confoverrides={
+                "typer_cache_dir": str(cache_dir),
+                "typer_prerender_manifest": str(cache_dir / "prerender.json"),
+            },
+        )
+        app.build()
+        assert not app.statuscode, "Sphinx build failed"
+        return app
+
+    app = build()
+    # the other pages document commands with other options
+    assert app.env.typer_cache_stats["index"] == {"hits": 5, "misses": 0}
+
+    assert check_prerender_manifest(app) == 0
+    shutil.rmtree(cache_dir / run["cache"][0][:2])
+    assert check_prerender_manifest(app) == 1
+    shutil.rmtree(bld_dir, ignore_errors=True)
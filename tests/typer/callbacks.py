@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from sphinxcontrib import typer
 from pathlib import Path
 import json
@@ -39,3 +40,160 @@ def typer_svg2pdf(*args, **kwargs):
 def typer_convert_png(*args, **kwargs):
     record_callback("typer_convert_png")
     return typer.typer_convert_png(*args, **kwargs)
+
+
+class FakeWebDriver:
+    """
+    A stand in for a selenium web driver that measures pages by counting their
+    lines so web driver workflows can be tested (and benchmarked) without a
+    browser.
+    """
+
+    LINE_HEIGHT = 10
+    CHAR_WIDTH = 8
+
+    started = 0
+    page_loads = 0
+    scripts = 0
+
+    def __init__(self):
+        self.page = ""
+        FakeWebDriver.started += 1
+
+    @classmethod
+    def reset_counts(cls):
+        cls.started = cls.page_loads = cls.scripts = 0
+
+    @classmethod
+    def height(cls, html_page):
+        return html_page.count("\n") * cls.LINE_HEIGHT
+
+    @classmethod
+    def width(cls, html_page):
+        return max(map(len, html_page.splitlines() or [""])) * cls.CHAR_WIDTH
+
+    def get(self, url):
+        import base64
+
+        FakeWebDriver.page_loads += 1
+        if url.startswith("data:"):
+            self.page = base64.b64decode(url.split(",", 1)[1]).decode()
+        elif url.startswith("file://"):
+            self.page = Path(url[len("file://") :]).read_text(encoding="utf-8")
+        else:
+            self.page = ""
+
+    def delete_all_cookies(self):
+        pass
+
+    def get_window_size(self):
+        return {"width": 1920, "height": 2048}
+
+    def set_window_size(self, width, height):
+        pass
+
+    def find_element(self, by, value):
+        from types import SimpleNamespace
+
+        return SimpleNamespace(
+            location={"x": 0, "y": 0},
+            size={"width": self.width(self.page), "height": self.height(self.page)},
+        )
+
+    def get_screenshot_as_png(self):
+        import io
+
+        from PIL import Image
+
+        png = io.BytesIO()
+        size = (max(self.width(self.page), 1), max(self.height(self.page), 1))
+        Image.new("RGB", size, "white").save(png, format="PNG")
+        return png.getvalue()
+
+    def execute_script(self, script, *args):
+        FakeWebDriver.scripts += 1
+        if "devicePixelRatio" in script:
+            return 1
+        return self.height(self.page)
+
+    def execute_async_script(self, script, pages):
+        FakeWebDriver.scripts += 1
+        return [self.height(page) for page in pages]
+
+    def quit(self):
+        pass
+
+
+@contextmanager
+def fake_web_driver(directive):
+    yield FakeWebDriver()
+
+
+broken_web_drivers = []
+
+
+@contextmanager
+def broken_web_driver(directive):
+    """A web driver factory that always fails to start a browser."""
+    broken_web_drivers.append(directive)
+    raise directive.severe("no browser is installed")
+    yield
+
+
+artifacts_written = []
+
+
+def fake_artifact(directive, rendered, path):
+    """Write the rendered help in place of a converted image."""
+    artifacts_written.append(path)
+    Path(path).write_text(rendered)
+
+
+other_fake_artifact = fake_artifact
+
+
+def driver_artifact(directive, rendered, path):
+    """
+    Acquire a web driver as the png conversion does, but write the rendered help
+    in place of a screenshot so selenium is not needed.
+    """
+    from sphinxcontrib.typer import acquire_web_driver
+
+    with acquire_web_driver(directive):
+        fake_artifact(directive, rendered, path)
+
+
+def directive_artifact(directive, rendered, path):
+    """Write the directive attributes the hook can see in place of an image."""
+    import json
+
+    Path(path).write_text(
+        json.dumps(
+            {
+                "arguments": directive.arguments,
+                "options": sorted(directive.options),
+                "builder": directive.builder,
+                "target": str(directive.target),
+                "width": directive.width,
+                "prog_name": directive.prog_name,
+                "max_workers": directive.env.app.config.typer_max_workers,
+            }
+        )
+    )
+
+
+def no_artifact(directive, rendered, path):
+    """A conversion hook that fails without raising, and writes nothing."""
+
+
+def red_sands_kwargs(directive, name, command, ctx, parent):
+    """A new terminal theme object for every render, as in a new interpreter."""
+    from rich.terminal_theme import TerminalTheme
+
+    return {
+        "theme": TerminalTheme(
+            (132, 42, 38),
+            (210, 193, 159),
+            [(210, 193, 159), (0, 0, 0), (77, 218, 77), (227, 189, 57)] * 2,
+        )
+    }